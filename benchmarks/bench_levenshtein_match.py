@@ -0,0 +1,150 @@
+"""
+Micro-benchmark of the levenshtein based error-set matching of compute_metrics
+on chain-of-thought sized outputs, against the unbounded implementation it replaced.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_levenshtein_match --num_instances 2000
+"""
+
+import argparse
+import random
+import string
+import time
+
+from Levenshtein import distance
+
+from evaluation.compute_metrics import (
+    LEVENSHTEIN_ERROR_SETS_DISTANCE_THRESHOLD,
+    LEVENSHTEIN_WEIGHTS,
+    compute_reasoning_analysis_levenshtein_based_match,
+)
+
+
+def unbounded_match(pred, gt):
+    """
+    compute_reasoning_analysis_levenshtein_based_match before the bounded
+    matcher: two full distances per candidate
+
+    Parameters:
+        pred (str): post-processed prediction
+        gt (str): post-processed candidate
+
+    Return:
+        Bool: 0 or 1 based on match.
+    """
+    levenshtein_distance = distance(pred, gt, weights=LEVENSHTEIN_WEIGHTS)
+    levenshtein_distance_no_space = distance(
+        pred.replace(" ", ""), gt.replace(" ", ""), weights=LEVENSHTEIN_WEIGHTS
+    )
+    return int(
+        levenshtein_distance <= LEVENSHTEIN_ERROR_SETS_DISTANCE_THRESHOLD
+        or levenshtein_distance_no_space <= LEVENSHTEIN_ERROR_SETS_DISTANCE_THRESHOLD
+    )
+
+
+def random_text(rng: random.Random, length: int) -> str:
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(
+            "".join(
+                rng.choice(string.ascii_lowercase) for _ in range(rng.randint(1, 9))
+            )
+        )
+    return " ".join(words)[:length]
+
+
+def make_instances(num_instances: int, num_candidates: int, seed: int = 0) -> list:
+    """
+    (prediction, candidates) instances: mostly long chain-of-thought predictions,
+    plus a few near matches of their candidates that are scored in full
+
+    Parameters:
+        num_instances (int): number of instances
+        num_candidates (int): candidates per instance, like an error set
+        seed (int): random seed
+
+    Return:
+        list: (prediction, candidates) instances
+    """
+    rng = random.Random(seed)
+    instances = []
+    for _ in range(num_instances):
+        candidates = [
+            random_text(rng, rng.randint(7, 60)) for _ in range(num_candidates)
+        ]
+        if rng.random() < 0.8:
+            # chain-of-thought output that the parser could not truncate
+            prediction = random_text(rng, rng.randint(500, 3000))
+        else:
+            # a few edits away from a candidate, with or without spaces
+            prediction = list(rng.choice(candidates))
+            for _ in range(rng.randint(0, 6)):
+                position = rng.randrange(len(prediction) + 1)
+                if rng.random() < 0.5 or position == len(prediction):
+                    prediction.insert(position, rng.choice(string.ascii_lowercase))
+                else:
+                    del prediction[position]
+            prediction = "".join(prediction)
+            if rng.random() < 0.3:
+                prediction = prediction.replace(" ", "")
+        instances.append((prediction, candidates))
+    return instances
+
+
+def run_unbounded(instances: list) -> list:
+    return [
+        [unbounded_match(prediction, candidate) for candidate in candidates]
+        for prediction, candidates in instances
+    ]
+
+
+def run_bounded(instances: list) -> list:
+    results = []
+    for prediction, candidates in instances:
+        # computed once per instance, as in compute_reasoning_if_errors
+        prediction_no_space = prediction.replace(" ", "")
+        results.append(
+            [
+                compute_reasoning_analysis_levenshtein_based_match(
+                    prediction, candidate, prediction_no_space
+                )
+                for candidate in candidates
+            ]
+        )
+    return results
+
+
+def time_run(run, instances: list, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = run(instances)
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_instances", type=int, default=2000)
+    parser.add_argument("--num_candidates", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    instances = make_instances(args.num_instances, args.num_candidates, args.seed)
+    unbounded_time, unbounded_results = time_run(run_unbounded, instances, args.repeat)
+    bounded_time, bounded_results = time_run(run_bounded, instances, args.repeat)
+    assert bounded_results == unbounded_results, "bounded matcher results differ"
+
+    num_matches = sum(sum(results) for results in bounded_results)
+    print(
+        f"instances: {len(instances)}, candidates: {args.num_candidates}, "
+        f"matches: {num_matches}"
+    )
+    print(f"unbounded: {unbounded_time * 1000:.1f} ms")
+    print(f"bounded:   {bounded_time * 1000:.1f} ms")
+    print(f"speedup:   {unbounded_time / bounded_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,26 @@
 import numpy as np
 import pandas as pd
 
+from evaluation.metric_utils import write_report_table
+
 STRICT_EM_COUNT_COLUMN_NAME = "instr_strict_em_count"
 LOOSE_EM_COUNT_COLUMN_NAME = "instr_loose_em_count"
 INSTANCES_COUNT_COLUMN_NAME = "instr_count"
 
 IGNORE_ROWS = ["print_correct_answer", "print_correct_answer_label"]
 
+EM_COUNT_COLUMN_NAMES = {
+    "strict": STRICT_EM_COUNT_COLUMN_NAME,
+    "loose": LOOSE_EM_COUNT_COLUMN_NAME,
+}
+BENCHMARK_COLUMNS = [
+    "Models",
+    "Micro-Avg EM",
+    "Instr. Category EM",
+    "Knowledge Task EM",
+    "Micro-Avg EM(No Follow)",
+]
+
 
 def micro_avg_em(instr_df: pd.DataFrame, category: str = "strict"):
     """
@@ -48,11 +62,8 @@ def weighted_micro_avg_instruction(class_df: pd.DataFrame, category: str = "stri
         if category == "strict"
         else LOOSE_EM_COUNT_COLUMN_NAME
     )
-    avg_scores = []
-    for _id, row in df.iterrows():
-        curr_avg = row[col_name] / row[INSTANCES_COUNT_COLUMN_NAME]
-        avg_scores.append(curr_avg)
-    return np.mean(avg_scores)
+    avg_scores = df[col_name] / df[INSTANCES_COUNT_COLUMN_NAME]
+    return np.mean(avg_scores.to_numpy())
 
 
 def weighted_em_knowledge_task(class_data_df: pd.DataFrame, category: str = "strict"):
@@ -74,14 +85,9 @@ def weighted_em_knowledge_task(class_data_df: pd.DataFrame, category: str = "str
         else LOOSE_EM_COUNT_COLUMN_NAME
     )
     # Group by 'dataset' column
-    grouped = df.groupby("dataset")
-    avg_scores = []
-    for group_name, group_data in grouped:
-        curr_avg = (
-            group_data[col_name].sum() / group_data[INSTANCES_COUNT_COLUMN_NAME].sum()
-        )
-        avg_scores.append(curr_avg)
-    return np.mean(avg_scores)
+    grouped = df.groupby("dataset")[[col_name, INSTANCES_COUNT_COLUMN_NAME]].sum()
+    avg_scores = grouped[col_name] / grouped[INSTANCES_COUNT_COLUMN_NAME]
+    return np.mean(avg_scores.to_numpy())
 
 
 def compute_benchmark_scores(
@@ -115,25 +121,135 @@ def compute_benchmark_scores(
     return scores
 
 
-def write_benchmark_results(benchmark_scores: list, output_file: str):
+def mean_by_model(scores: pd.DataFrame, models: pd.Series):
     """
-    Compute the average benchmark score, sort the models and write the benchmark results.
+    Arithmetic mean of the scores of each model, NaN when one of them is NaN
+
+    Parameters:
+        scores (pd.DataFrame): scores, a column per category
+        models (pd.Series): model of each row
+
+    Return:
+        pd.DataFrame: mean scores, a row per model
+    """
+    means = scores.groupby(models.to_numpy(), sort=False).mean()
+    return means.mask(scores.isna().groupby(models.to_numpy(), sort=False).any())
+
+
+def compute_leaderboard(
+    instr_df: pd.DataFrame,
+    noif_instr_df: pd.DataFrame,
+    class_df: pd.DataFrame,
+    class_data_df: pd.DataFrame,
+    model_column: str = "model",
+):
+    """
+    Benchmark scores of many models at once, with a groupby per table.
+    Scores match compute_benchmark_scores up to floating point rounding
 
     Parameters:
-        benchmark_scores (list): Each element contains the 4 scores obtained per model
-        output_file (str): Output file path for the benchmark results
-    """
-    columns = [
-        "Models",
-        "Micro-Avg EM",
-        "Instr. Category EM",
-        "Knowledge Task EM",
-        "Micro-Avg EM(No Follow)",
-    ]
-    benchmark_df = pd.DataFrame(benchmark_scores, columns=columns)
-    benchmark_df["Avg scores"] = benchmark_df[list(benchmark_df.columns)[1:]].mean(
-        axis=1
+        instr_df (pd.DataFrame): Metrics computed for every instruction, of every
+            model
+        noif_instr_df (pd.DataFrame): No instruction following metrics computed for
+            every instruction, of every model
+        class_df (pd.DataFrame): Metrics computed for every instruction category, of
+            every model
+        class_data_df (pd.DataFrame): Metrics computed for every knowledge task per
+            instruction category, of every model
+        model_column (str): Column of the frames holding the model name. Defaults to
+            model
+
+    Return:
+        pd.DataFrame: strict and loose BENCHMARK_COLUMNS scores of every model,
+        with a category column, in the order of the models in instr_df
+    """
+    count_columns = list(EM_COUNT_COLUMN_NAMES.values())
+    categories = list(EM_COUNT_COLUMN_NAMES)
+
+    def micro_avg(df):
+        df = df[~df["instruction"].isin(IGNORE_ROWS)]
+        sums = df.groupby(model_column, sort=False)[
+            count_columns + [INSTANCES_COUNT_COLUMN_NAME]
+        ].sum()
+        scores = sums[count_columns].div(sums[INSTANCES_COUNT_COLUMN_NAME], axis=0)
+        return scores.set_axis(categories, axis=1)
+
+    df = class_df[~class_df["classification"].isin(IGNORE_ROWS)]
+    instr_category_scores = mean_by_model(
+        df[count_columns]
+        .div(df[INSTANCES_COUNT_COLUMN_NAME], axis=0)
+        .set_axis(categories, axis=1),
+        df[model_column],
     )
-    sorted_df = benchmark_df.sort_values(by="Avg scores", ascending=False)
-    sorted_df.to_excel(output_file, index=False)
+
+    df = class_data_df[~class_data_df["classification"].isin(IGNORE_ROWS)]
+    sums = (
+        df.groupby([model_column, "dataset"], sort=False)[
+            count_columns + [INSTANCES_COUNT_COLUMN_NAME]
+        ]
+        .sum()
+        .reset_index()
+    )
+    knowledge_task_scores = mean_by_model(
+        sums[count_columns]
+        .div(sums[INSTANCES_COUNT_COLUMN_NAME], axis=0)
+        .set_axis(categories, axis=1),
+        sums[model_column],
+    )
+
+    models = pd.Index(instr_df[model_column].unique())
+    scores = {
+        BENCHMARK_COLUMNS[1]: micro_avg(instr_df),
+        BENCHMARK_COLUMNS[2]: instr_category_scores,
+        BENCHMARK_COLUMNS[3]: knowledge_task_scores,
+        BENCHMARK_COLUMNS[4]: micro_avg(noif_instr_df),
+    }
+    leaderboard = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    BENCHMARK_COLUMNS[0]: models,
+                    "category": category,
+                    **{
+                        column: column_scores[category].reindex(models).to_numpy()
+                        for column, column_scores in scores.items()
+                    },
+                }
+            )
+            for category in categories
+        ],
+        ignore_index=True,
+    )
+    return leaderboard
+
+
+def rank_benchmark_scores(benchmark_df: pd.DataFrame):
+    """
+    Average the benchmark scores of every model and sort the models by average
+
+    Parameters:
+        benchmark_df (pd.DataFrame): BENCHMARK_COLUMNS scores, a row per model
+
+    Return:
+        pd.DataFrame: scores with an "Avg scores" column, best model first
+    """
+    benchmark_df = benchmark_df[BENCHMARK_COLUMNS].copy()
+    benchmark_df["Avg scores"] = benchmark_df[BENCHMARK_COLUMNS[1:]].mean(axis=1)
+    return benchmark_df.sort_values(by="Avg scores", ascending=False)
+
+
+def write_benchmark_results(benchmark_scores, output_file: str):
+    """
+    Compute the average benchmark score, sort the models and write the benchmark results.
+
+    Parameters:
+        benchmark_scores (list | pd.DataFrame): Each element contains the 4 scores
+            obtained per model, or the rows of a single category of compute_leaderboard
+        output_file (str): Output file path for the benchmark results, its extension
+            gives the format, one of metric_utils.REPORT_FORMATS
+    """
+    if not isinstance(benchmark_scores, pd.DataFrame):
+        benchmark_scores = pd.DataFrame(benchmark_scores, columns=BENCHMARK_COLUMNS)
+    sorted_df = rank_benchmark_scores(benchmark_scores.reset_index(drop=True))
+    write_report_table(sorted_df, output_file)
     return
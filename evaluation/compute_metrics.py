@@ -1,22 +1,61 @@
 import argparse
-import copy
+import hashlib
+import inspect
+import os
 import json
 import string
+import sys
 from pathlib import Path
 import re
+from functools import lru_cache
 
 import pandas as pd
+import Levenshtein
 from Levenshtein import distance
 from tqdm import tqdm
 import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
 
 import evaluation.metric_utils as metric_utils
-from evaluation.benchmark import compute_benchmark_scores, write_benchmark_results
+from evaluation.benchmark import compute_leaderboard, write_benchmark_results
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from inference.columnar_io import iter_columnar_results  # noqa: E402
+from inference.jsonl_io import dumps, iter_jsonl  # noqa: E402
 
 LEVENSHTEIN_DISTANCE_THRESHOLD = 2
 LEVENSHTEIN_ERROR_SETS_DISTANCE_THRESHOLD = 4
 REASONING_OR_IF_CANDIDATE_LENGTH_THRESHOLD = 6
 LEVENSHTEIN_WEIGHTS = (1, 1, 2)
+# characters dropped from ground truths and predictions by postprocess_output
+POSTPROCESS_TABLE = str.maketrans("", "", "[]$'")
+WHITESPACE_TABLE = str.maketrans("", "", string.whitespace)
+RESPONSE_PATTERN = re.compile("Response:|response:")
+ANSWER_IS_DETECT_PATTERN = re.compile("answer is:|answer is :")
+ANSWER_IS_PATTERN = re.compile("answer is:|answer is :|Answer is:|Answer is :")
+# parsed outputs kept, an instance and its print_correct_answer are scored together
+PARSED_OUTPUT_CACHE_SIZE = 4096
+# default score cache folder, shared by every output folder
+DEFAULT_SCORE_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "kcif", "score_cache"
+)
+# chunks of a results file per worker with --workers, to balance the load
+CHUNKS_PER_WORKER = 4
+
+# fields of an inference result read for scoring, the prompt and input are not
+SCORING_FIELDS = (
+    "dataset",
+    "instruction_id",
+    "dataset_input",
+    "output",
+    "instruction_output",
+    "ground_truth_answer_label",
+    "reasoning_error_set",
+    "instruction_following_errors_set",
+)
 
 
 def postprocess_output(prediction: str):
@@ -29,11 +68,7 @@ def postprocess_output(prediction: str):
     Return:
         str: post-processed output
     """
-    llmoutput = str(copy.deepcopy(prediction))
-    llmoutput = llmoutput.replace("[", "")
-    llmoutput = llmoutput.replace("]", "")
-    llmoutput = llmoutput.replace("$", "")
-    llmoutput = llmoutput.replace("'", "")
+    llmoutput = str(prediction).translate(POSTPROCESS_TABLE)
     if llmoutput.endswith("."):
         llmoutput = llmoutput[:-1]
     llmoutput = llmoutput.strip()
@@ -50,9 +85,10 @@ def em_parse_llm_output(test_instance: dict):
     Return:
         Tuple(str, str): strict and loose LLM prediction strings for exact match computation
     """
-    if "Response:" not in test_instance["output"]:
-        strict_response_prediction = postprocess_output(test_instance["output"].strip())
-        truncated_output = test_instance["output"].rsplit("\n", 1)[-1]
+    output = test_instance["output"]
+    if "Response:" not in output:
+        strict_response_prediction = postprocess_output(output.strip())
+        truncated_output = output.rsplit("\n", 1)[-1]
         if "answer is:" in truncated_output:
             truncated_output = truncated_output.rsplit("answer is:", 1)[-1]
         elif "answer is :" in truncated_output:
@@ -60,7 +96,7 @@ def em_parse_llm_output(test_instance: dict):
         loose_response_prediction = postprocess_output(truncated_output.strip())
     else:
         strict_response_prediction = postprocess_output(
-            test_instance["output"].split("Response:")[-1].strip()
+            output.rsplit("Response:", 1)[-1].strip()
         )
         loose_response_prediction = strict_response_prediction
     return strict_response_prediction, loose_response_prediction
@@ -76,43 +112,108 @@ def analysis_parse_llm_output(test_instance: dict):
     Return:
         Tuple(str, str): strict and loose LLM prediction strings for error analysis
     """
-    if "Response:" not in test_instance["output"]:
-        if "answer is" in test_instance["output"]:
-            truncated_output = (
-                test_instance["output"].strip().rsplit("answer is", 1)[-1]
-            )
+    output = test_instance["output"]
+    if "Response:" not in output:
+        if "answer is" in output:
+            truncated_output = output.strip().rsplit("answer is", 1)[-1]
             truncated_output = truncated_output.replace(":", "").strip()
-        elif ":" in test_instance["output"]:
-            truncated_output = test_instance["output"].strip().rsplit(":", 1)[-1]
-        elif "\n" in test_instance["output"]:
-            truncated_output = test_instance["output"].strip().rsplit("\n", 1)[-1]
+        elif ":" in output:
+            truncated_output = output.strip().rsplit(":", 1)[-1]
+        elif "\n" in output:
+            truncated_output = output.strip().rsplit("\n", 1)[-1]
         else:
-            truncated_output = test_instance["output"].strip()
+            truncated_output = output.strip()
         strict_response_prediction = postprocess_output(truncated_output.strip())
         loose_response_prediction = strict_response_prediction
     else:
         strict_response_prediction = postprocess_output(
-            test_instance["output"].split("Response:")[-1].strip()
+            output.rsplit("Response:", 1)[-1].strip()
         )
-        loose_response_prediction = postprocess_output(test_instance["output"].strip())
+        loose_response_prediction = postprocess_output(output.strip())
     return strict_response_prediction, loose_response_prediction
 
 
-def parse_llm_output(test_instance: dict):
+def parse_output(output: str):
+    """
+    Parse the prediction out of an LLM output: the text after the last
+    "Response:" or "answer is:" marker, else its last line, post-processed
+
+    Parameters:
+        output (str): LLM output of an inference instance
+
+    Return:
+        str: post-processed LLM prediction
+    """
+    if RESPONSE_PATTERN.search(output):
+        response = RESPONSE_PATTERN.split(output)[-1].strip()
+    # only the lower case markers select this parse, the split accepts both
+    elif ANSWER_IS_DETECT_PATTERN.search(output):
+        response = ANSWER_IS_PATTERN.split(output)[-1].strip()
+    elif "\n" in output:
+        response = output.rsplit("\n", 1)[-1]
+    else:
+        response = output
+    return postprocess_output(response)
+
+
+class ParsedOutput:
+    """
+    LLM prediction parsed once per output, with the normalized forms that the
+    exact match and error analysis matchers compare against. Strict and loose
+    scores are computed on the same prediction.
+    """
+
+    __slots__ = ("prediction", "no_space", "no_whitespace")
+
+    def __init__(self, prediction: str):
+        self.prediction = prediction
+        # levenshtein matches of the error sets also compare without spaces
+        self.no_space = prediction.replace(" ", "")
+        self.no_whitespace = prediction.translate(WHITESPACE_TABLE)
+
+    def matches(self, candidate: str):
+        """
+        Exact match of the prediction, or of both strings without whitespace
+
+        Parameters:
+            candidate (str): post-processed ground truth or error-set candidate
+
+        Return:
+            Bool: True if the candidate matches the prediction
+        """
+        return self.prediction == candidate or (
+            candidate.translate(WHITESPACE_TABLE) == self.no_whitespace
+        )
+
+
+@lru_cache(maxsize=PARSED_OUTPUT_CACHE_SIZE)
+def get_cached_parsed_output(output: str):
+    return ParsedOutput(parse_output(output))
+
+
+def get_parsed_output(test_instance: dict):
+    """
+    Parsed LLM output of an inference instance. Parsing is cached on the output
+    string, so the exact match, the error analysis and the print_correct_answer
+    scores of an instance share a single parse.
+
+    Parameters:
+        test_instance (dict): Dictionary corresponding to a single inference test
+            instance
+
+    Return:
+        ParsedOutput: parsed LLM prediction
+    """
     if "output" not in test_instance:
-        return ""
-    response = test_instance["output"]
-    if any(resp in response for resp in ["Response:", "response:"]):
-        response = re.split("Response:|response:", test_instance["output"])[-1].strip()
-    elif any(resp.lower() in response for resp in ["answer is:", "answer is :"]):
-        response = re.split(
-            "answer is:|answer is :|Answer is:|Answer is :", test_instance["output"]
-        )[-1].strip()
-    elif "\n" in response:
-        response = test_instance["output"].rsplit("\n", 1)[-1]
+        return ParsedOutput("")
+    output = test_instance["output"]
+    if not isinstance(output, str):
+        return ParsedOutput(parse_output(output))
+    return get_cached_parsed_output(output)
+
 
-    response = postprocess_output(response)
-    return response
+def parse_llm_output(test_instance: dict):
+    return get_parsed_output(test_instance).prediction
 
 
 def compare_removing_whitespace(ground_truth, prediction):
@@ -126,9 +227,9 @@ def compare_removing_whitespace(ground_truth, prediction):
     Return:
         Bool: 0 or 1 corresponding to match
     """
-    return ground_truth.translate(
-        str.maketrans("", "", string.whitespace)
-    ) == prediction.translate(str.maketrans("", "", string.whitespace))
+    return ground_truth.translate(WHITESPACE_TABLE) == prediction.translate(
+        WHITESPACE_TABLE
+    )
 
 
 def compute_exact_match(
@@ -136,6 +237,8 @@ def compute_exact_match(
     test_instance: dict,
     pca_instance: dict,
     pca_label_instance: dict,
+    pca_em: int = None,
+    pca_label_em: int = None,
 ):
     """
     Function to compute exact match for each instance.
@@ -147,6 +250,9 @@ def compute_exact_match(
         test_instance (dict): Dictionary corresponding to a single inference test instance
         pca_instance (dict): print_correct_answer instance of current test utterance
         pca_label_instance (dict): print_correct_answer_label instance of current test utterance
+        pca_em (int): compute_pca_exact_match of pca_instance, computed here if None
+        pca_label_em (int): compute_pca_exact_match of pca_label_instance, computed
+            here if None
 
     Return:
         dict: updated em_metrics dict with computed exact match metrics
@@ -159,39 +265,61 @@ def compute_exact_match(
     em_metrics["pca_label_loose"] = 0
 
     ground_truth = postprocess_output(test_instance["instruction_output"][-1])
-    prediction = parse_llm_output(test_instance)
+    parsed_output = get_parsed_output(test_instance)
 
-    if (prediction == ground_truth) or compare_removing_whitespace(
-        ground_truth, prediction
-    ):
+    if parsed_output.matches(ground_truth):
         em_metrics["strict"] = em_metrics["loose"] = 1
 
     if pca_instance:
-        pca_gt = (
-            postprocess_output(str(pca_instance["instruction_output"][-1]))
-            if pca_instance
-            else ""
-        )
-        pca_pred = parse_llm_output(pca_instance)
-        if (pca_pred == pca_gt) or compare_removing_whitespace(pca_gt, pca_pred):
-            em_metrics["pca_strict"] = em_metrics["pca_loose"] = 1
+        if pca_em is None:
+            pca_em = compute_pca_exact_match(pca_instance)
+        em_metrics["pca_strict"] = em_metrics["pca_loose"] = pca_em
 
     if pca_label_instance:
-        pca_label_gt = (
-            postprocess_output(str(pca_label_instance["instruction_output"][-1]))
-            if pca_label_instance
-            else ""
-        )
-        pca_label_pred = parse_llm_output(pca_label_instance)
-        if (pca_label_pred == pca_label_gt) or compare_removing_whitespace(
-            pca_label_gt, pca_label_pred
-        ):
-            em_metrics["pca_label_strict"] = em_metrics["pca_label_loose"] = 1
+        if pca_label_em is None:
+            pca_label_em = compute_pca_exact_match(pca_label_instance)
+        em_metrics["pca_label_strict"] = em_metrics["pca_label_loose"] = pca_label_em
 
     return em_metrics
 
 
-def compute_levenshtein_based_match(pred, gt):
+def is_within_levenshtein_distance(pred, gt, threshold, pred_no_space=None):
+    """
+    Whether the weighted levenshtein distance between the prediction and the
+    ground truth, with or without spaces, is at most threshold.
+    Insertions and deletions cost 1, so the distance is at least the length
+    difference: pairs further apart are rejected without computing it, and
+    the distance is only computed up to threshold (score_cutoff)
+
+    Parameters:
+        pred (str): post-processed prediction
+        gt (str): post-processed ground truth
+        threshold (int): maximum distance
+        pred_no_space (str): pred without spaces, computed here if None
+
+    Return:
+        Bool: True if within the distance
+    """
+    if abs(len(pred) - len(gt)) <= threshold and (
+        distance(pred, gt, weights=LEVENSHTEIN_WEIGHTS, score_cutoff=threshold)
+        <= threshold
+    ):
+        return True
+    if pred_no_space is None:
+        pred_no_space = pred.replace(" ", "")
+    gt_no_space = gt.replace(" ", "")
+    return abs(len(pred_no_space) - len(gt_no_space)) <= threshold and (
+        distance(
+            pred_no_space,
+            gt_no_space,
+            weights=LEVENSHTEIN_WEIGHTS,
+            score_cutoff=threshold,
+        )
+        <= threshold
+    )
+
+
+def compute_levenshtein_based_match(pred, gt, pred_no_space=None):
     """
     Compute a levenshtein distance based exact match (loose matching)
     We prioritize addition and removal over updates (i.e.) LEVENSHTEIN_WEIGHTS
@@ -199,24 +327,20 @@ def compute_levenshtein_based_match(pred, gt):
     Parameters:
         pred (str): post-processed prediction
         gt (str): post-processed ground truth
+        pred_no_space (str): pred without spaces, computed here if None
 
     Return:
         Bool: 0 or 1 based on match.
     """
     loose_em = 0
-    levenshtein_distance = distance(pred, gt, weights=LEVENSHTEIN_WEIGHTS)
-    levenshtein_distance_no_space = distance(
-        pred.replace(" ", ""), gt.replace(" ", ""), weights=LEVENSHTEIN_WEIGHTS
-    )
-    if (
-        levenshtein_distance <= LEVENSHTEIN_DISTANCE_THRESHOLD
-        or levenshtein_distance_no_space <= LEVENSHTEIN_DISTANCE_THRESHOLD
+    if is_within_levenshtein_distance(
+        pred, gt, LEVENSHTEIN_DISTANCE_THRESHOLD, pred_no_space
     ):
         loose_em = 1
     return loose_em
 
 
-def compute_reasoning_analysis_levenshtein_based_match(pred, gt):
+def compute_reasoning_analysis_levenshtein_based_match(pred, gt, pred_no_space=None):
     """
     Compute a levenshtein distance based error analysis match (loose matching)
     Differs from exact match distance in terms of distance threshold.
@@ -225,18 +349,14 @@ def compute_reasoning_analysis_levenshtein_based_match(pred, gt):
     Parameters:
         pred (str): post-processed prediction
         gt (str): post-processed ground truth
+        pred_no_space (str): pred without spaces, computed here if None
 
     Return:
         Bool: 0 or 1 based on match.
     """
     loose_em = 0
-    levenshtein_distance = distance(pred, gt, weights=LEVENSHTEIN_WEIGHTS)
-    levenshtein_distance_no_space = distance(
-        pred.replace(" ", ""), gt.replace(" ", ""), weights=LEVENSHTEIN_WEIGHTS
-    )
-    if (
-        levenshtein_distance <= LEVENSHTEIN_ERROR_SETS_DISTANCE_THRESHOLD
-        or levenshtein_distance_no_space <= LEVENSHTEIN_ERROR_SETS_DISTANCE_THRESHOLD
+    if is_within_levenshtein_distance(
+        pred, gt, LEVENSHTEIN_ERROR_SETS_DISTANCE_THRESHOLD, pred_no_space
     ):
         loose_em = 1
     return loose_em
@@ -289,6 +409,7 @@ def compute_reasoning_if_errors(
     pca_instance: dict,
     pca_label_instance: dict,
     em: int,
+    pca_analysis: dict = None,
 ):
     """
     Function to compute error analysis for each instance.
@@ -302,6 +423,8 @@ def compute_reasoning_if_errors(
         pca_instance (dict): print_correct_answer instance of current test utterance
         pca_label_instance (dict): print_correct_answer_label instance of current test utterance
         em (int): Exact match value
+        pca_analysis (dict): compute_pca_error_analysis of pca_instance, computed
+            here if None
 
     Return:
         dict: updated analysis_metrics dict with computed error analysis metrics
@@ -321,7 +444,10 @@ def compute_reasoning_if_errors(
     analysis_metrics["pca_label_unclass"] = 0
 
     ground_truth = postprocess_output(test_instance["instruction_output"][-1])
-    prediction = parse_llm_output(test_instance)
+    parsed_output = get_parsed_output(test_instance)
+    prediction = parsed_output.prediction
+    # shared by the levenshtein matches against every candidate
+    prediction_no_space = parsed_output.no_space
 
     key_val = (
         test_instance["dataset"]
@@ -331,10 +457,12 @@ def compute_reasoning_if_errors(
         + test_instance["instruction_id"]
     )
     reasoning_set = test_instance["reasoning_error_set"]
-    if_set = test_instance["instruction_following_errors_set"]
+    # extended on a copy, the instance may be the print_correct_answer of others
+    if_set = test_instance["instruction_following_errors_set"] + (
+        add_missing_labels_in_if_error(test_instance)
+    )
 
     reasoning_set = list(map(postprocess_output, reasoning_set))
-    if_set.extend(add_missing_labels_in_if_error(test_instance))
     if_set = list(map(postprocess_output, if_set))
 
     if em == 0:
@@ -353,11 +481,9 @@ def compute_reasoning_if_errors(
                     analysis_metrics["reason_strict"] = analysis_metrics[
                         "reason_loose"
                     ] = compute_reasoning_analysis_levenshtein_based_match(
-                        prediction, candidate
+                        prediction, candidate, prediction_no_space
                     )
-                if (prediction == candidate) or compare_removing_whitespace(
-                    candidate, prediction
-                ):
+                if parsed_output.matches(candidate):
                     analysis_metrics["reason_strict"] = analysis_metrics[
                         "reason_loose"
                     ] = 1
@@ -375,12 +501,10 @@ def compute_reasoning_if_errors(
                 if len(candidate) > REASONING_OR_IF_CANDIDATE_LENGTH_THRESHOLD:
                     analysis_metrics["if_strict"] = analysis_metrics["if_loose"] = (
                         compute_reasoning_analysis_levenshtein_based_match(
-                            prediction, candidate
+                            prediction, candidate, prediction_no_space
                         )
                     )
-                if (prediction == candidate) or compare_removing_whitespace(
-                    candidate, prediction
-                ):
+                if parsed_output.matches(candidate):
                     analysis_metrics["if_strict"] = analysis_metrics["if_loose"] = 1
                 if analysis_metrics["if_strict"] == 1:
                     break
@@ -391,37 +515,519 @@ def compute_reasoning_if_errors(
             analysis_metrics["unclass_strict"] = analysis_metrics["unclass_loose"] = 1
 
     if pca_instance and em == 0:
-        pca_pred = parse_llm_output(pca_instance)
-        pca_reasoning_set = pca_instance["reasoning_error_set"]
-        pca_if_set = pca_instance["instruction_following_errors_set"]
-        pca_reasoning_set = list(map(postprocess_output, pca_reasoning_set))
-        pca_if_set = list(map(postprocess_output, pca_if_set))
-        for candidate in pca_reasoning_set:
-            if len(candidate) > REASONING_OR_IF_CANDIDATE_LENGTH_THRESHOLD:
-                analysis_metrics["pca_reason"] = (
-                    compute_reasoning_analysis_levenshtein_based_match(
-                        pca_pred, candidate
-                    )
+        if pca_analysis is None:
+            pca_analysis = compute_pca_error_analysis(pca_instance)
+        analysis_metrics["pca_reason"] = pca_analysis["pca_reason"]
+        analysis_metrics["pca_if"] = pca_analysis["pca_if"]
+        analysis_metrics["pca_unclass"] = pca_analysis["pca_unclass"]
+
+    return analysis_metrics
+
+
+def compute_pca_exact_match(pca_instance: dict):
+    """
+    Exact match of a print_correct_answer or print_correct_answer_label instance.
+    It only depends on the instance, so it is computed once and shared by every
+    instance of the same dataset_input
+
+    Parameters:
+        pca_instance (dict): print_correct_answer(_label) inference instance
+
+    Return:
+        Bool: 0 or 1 corresponding to match
+    """
+    pca_gt = postprocess_output(str(pca_instance["instruction_output"][-1]))
+    if get_parsed_output(pca_instance).matches(pca_gt):
+        return 1
+    return 0
+
+
+def compute_pca_error_analysis(pca_instance: dict):
+    """
+    Error analysis of a print_correct_answer instance, shared like
+    compute_pca_exact_match by every instance of the same dataset_input
+
+    Parameters:
+        pca_instance (dict): print_correct_answer inference instance
+
+    Return:
+        dict: pca_reason, pca_if and pca_unclass error flags
+    """
+    pca_analysis = {"pca_reason": 0, "pca_if": 0, "pca_unclass": 0}
+
+    parsed_output = get_parsed_output(pca_instance)
+    pca_pred = parsed_output.prediction
+    pca_pred_no_space = parsed_output.no_space
+    pca_reasoning_set = pca_instance["reasoning_error_set"]
+    pca_if_set = pca_instance["instruction_following_errors_set"]
+    pca_reasoning_set = list(map(postprocess_output, pca_reasoning_set))
+    pca_if_set = list(map(postprocess_output, pca_if_set))
+    for candidate in pca_reasoning_set:
+        if len(candidate) > REASONING_OR_IF_CANDIDATE_LENGTH_THRESHOLD:
+            pca_analysis["pca_reason"] = (
+                compute_reasoning_analysis_levenshtein_based_match(
+                    pca_pred, candidate, pca_pred_no_space
                 )
-            if candidate in pca_pred:
-                analysis_metrics["pca_reason"] = 1
-            if analysis_metrics["pca_reason"] == 1:
-                break
-        for candidate in pca_if_set:
-            if len(candidate) > REASONING_OR_IF_CANDIDATE_LENGTH_THRESHOLD:
-                analysis_metrics["pca_if"] = (
-                    compute_reasoning_analysis_levenshtein_based_match(
-                        pca_pred, candidate
-                    )
+            )
+        if candidate in pca_pred:
+            pca_analysis["pca_reason"] = 1
+        if pca_analysis["pca_reason"] == 1:
+            break
+    for candidate in pca_if_set:
+        if len(candidate) > REASONING_OR_IF_CANDIDATE_LENGTH_THRESHOLD:
+            pca_analysis["pca_if"] = compute_reasoning_analysis_levenshtein_based_match(
+                pca_pred, candidate, pca_pred_no_space
+            )
+        if candidate in pca_pred:
+            pca_analysis["pca_if"] = 1
+        if pca_analysis["pca_if"] == 1:
+            break
+    if pca_analysis["pca_reason"] == 0 and pca_analysis["pca_if"] == 0:
+        pca_analysis["pca_unclass"] = 1
+
+    return pca_analysis
+
+
+def read_inference_results(file_path: str):
+    """
+    Read an inference results file in a single pass, indexing the
+    print_correct_answer and print_correct_answer_label instances by
+    dataset_input (first occurrence wins)
+
+    Parameters:
+        file_path (str): path to the all_results.jsonl file, or to the
+            all_results.parquet or all_results.arrow folder written with
+            run_inference.py --output_format, of which only the SCORING_FIELDS
+            columns are read
+
+    Return:
+        Tuple(list, dict, dict): instances restricted to SCORING_FIELDS,
+        print_correct_answer index and print_correct_answer_label index
+    """
+    instances = []
+    pca_instances_dict = {}
+    pca_label_instances_dict = {}
+    if os.path.isdir(file_path):
+        results = iter_columnar_results(file_path, fields=SCORING_FIELDS)
+    else:
+        results = iter_jsonl(file_path, fields=SCORING_FIELDS)
+    for instance in results:
+        instances.append(instance)
+        if instance["instruction_id"] == "print_correct_answer":
+            pca_instances_dict.setdefault(instance["dataset_input"], instance)
+        elif instance["instruction_id"] == "print_correct_answer_label":
+            pca_label_instances_dict.setdefault(instance["dataset_input"], instance)
+    return instances, pca_instances_dict, pca_label_instances_dict
+
+
+def score_instances(
+    instances: list, pca_instances_dict: dict, pca_label_instances_dict: dict
+):
+    """
+    Exact match and error analysis of every instance, skipping the instances
+    excluded from the metrics and those that cannot be scored.
+    Runs in the worker processes with --workers
+
+    Parameters:
+        instances (list): inference test instances
+        pca_instances_dict (dict): print_correct_answer instances by dataset_input
+        pca_label_instances_dict (dict): print_correct_answer_label instances by
+            dataset_input
+
+    Return:
+        list: (MetricGroups, flags) of each instance, where flags holds the
+        metric_utils.EM_METRIC_FLAGS then ANALYSIS_METRIC_FLAGS values,
+        or None for the skipped instances
+    """
+    pca_em_dict = {}
+    pca_label_em_dict = {}
+    pca_analysis_dict = {}
+    scored_instances = []
+    for test_instance in instances:
+        try:
+            groups = metric_utils.get_metric_groups(
+                test_instance["dataset"], test_instance["instruction_id"]
+            )
+
+            if (
+                groups.dataset in metric_utils.NO_LIST_OPERATIONS_DATASETS
+                and groups.classification == "Operations on List"
+            ):
+                scored_instances.append(None)
+                continue
+
+            current_dataset_input = test_instance["dataset_input"]
+            print_correct_answer_instance = pca_instances_dict.get(
+                current_dataset_input, {}
+            )
+            print_correct_answer_label_instance = pca_label_instances_dict.get(
+                current_dataset_input, {}
+            )
+
+            em_metrics, analysis_metrics = {}, {}
+            em_metrics["pca_count"] = 0 if print_correct_answer_instance == {} else 1
+            em_metrics["pca_label_count"] = (
+                0 if print_correct_answer_label_instance == {} else 1
+            )
+
+            # print_correct_answer(_label) scores are shared by dataset_input
+            if (
+                print_correct_answer_instance
+                and current_dataset_input not in pca_em_dict
+            ):
+                pca_em_dict[current_dataset_input] = compute_pca_exact_match(
+                    print_correct_answer_instance
+                )
+            if (
+                print_correct_answer_label_instance
+                and current_dataset_input not in pca_label_em_dict
+            ):
+                pca_label_em_dict[current_dataset_input] = compute_pca_exact_match(
+                    print_correct_answer_label_instance
                 )
-            if candidate in pca_pred:
-                analysis_metrics["pca_if"] = 1
-            if analysis_metrics["pca_if"] == 1:
-                break
-        if analysis_metrics["pca_reason"] == 0 and analysis_metrics["pca_if"] == 0:
-            analysis_metrics["pca_unclass"] = 1
 
-    return analysis_metrics
+            em_metrics = compute_exact_match(
+                em_metrics,
+                test_instance,
+                print_correct_answer_instance,
+                print_correct_answer_label_instance,
+                pca_em_dict.get(current_dataset_input),
+                pca_label_em_dict.get(current_dataset_input),
+            )
+
+            # the error analysis is only needed when the instruction failed
+            if (
+                print_correct_answer_instance
+                and em_metrics["loose"] == 0
+                and current_dataset_input not in pca_analysis_dict
+            ):
+                pca_analysis_dict[current_dataset_input] = compute_pca_error_analysis(
+                    print_correct_answer_instance
+                )
+            analysis_metrics = compute_reasoning_if_errors(
+                analysis_metrics,
+                test_instance,
+                print_correct_answer_instance,
+                print_correct_answer_label_instance,
+                em_metrics["loose"],
+                pca_analysis_dict.get(current_dataset_input),
+            )
+
+            scored_instances.append(
+                (
+                    groups,
+                    itemgetter(*metric_utils.EM_METRIC_FLAGS)(em_metrics)
+                    + itemgetter(*metric_utils.ANALYSIS_METRIC_FLAGS)(analysis_metrics),
+                )
+            )
+        except Exception as e:
+            traceback.print_exc()
+            scored_instances.append(None)
+            continue
+
+    return scored_instances
+
+
+def split_metric_flags(flags: tuple):
+    """
+    em_metrics and analysis_metrics dicts of the flags returned by score_instances
+
+    Parameters:
+        flags (tuple): EM_METRIC_FLAGS then ANALYSIS_METRIC_FLAGS values
+
+    Return:
+        Tuple(dict, dict): em_metrics and analysis_metrics
+    """
+    num_em_flags = len(metric_utils.EM_METRIC_FLAGS)
+    return (
+        dict(zip(metric_utils.EM_METRIC_FLAGS, flags[:num_em_flags])),
+        dict(zip(metric_utils.ANALYSIS_METRIC_FLAGS, flags[num_em_flags:])),
+    )
+
+
+def submit_scoring(
+    executor: ProcessPoolExecutor,
+    instances: list,
+    pca_instances_dict: dict,
+    pca_label_instances_dict: dict,
+    num_chunks: int,
+):
+    """
+    Submit instances to the process pool in contiguous chunks, each with the
+    print_correct_answer(_label) instances it needs
+
+    Parameters:
+        executor (ProcessPoolExecutor): process pool
+        instances (list): inference test instances
+        pca_instances_dict (dict): print_correct_answer instances by dataset_input
+        pca_label_instances_dict (dict): print_correct_answer_label instances by
+            dataset_input
+        num_chunks (int): number of chunks
+
+    Return:
+        list: futures of the score_instances results, in the order of the instances
+    """
+    chunk_size = max(1, -(-len(instances) // num_chunks))
+    futures = []
+    for start in range(0, len(instances), chunk_size):
+        chunk = instances[start : start + chunk_size]
+        dataset_inputs = {instance.get("dataset_input") for instance in chunk}
+        futures.append(
+            executor.submit(
+                score_instances,
+                chunk,
+                {
+                    dataset_input: pca_instances_dict[dataset_input]
+                    for dataset_input in dataset_inputs
+                    if dataset_input in pca_instances_dict
+                },
+                {
+                    dataset_input: pca_label_instances_dict[dataset_input]
+                    for dataset_input in dataset_inputs
+                    if dataset_input in pca_label_instances_dict
+                },
+            )
+        )
+    return futures
+
+
+# the code computing the flags of an instance, hashed into SCORER_VERSION
+SCORING_FUNCTIONS = (
+    postprocess_output,
+    em_parse_llm_output,
+    analysis_parse_llm_output,
+    parse_output,
+    ParsedOutput,
+    get_cached_parsed_output,
+    get_parsed_output,
+    parse_llm_output,
+    compare_removing_whitespace,
+    compute_exact_match,
+    is_within_levenshtein_distance,
+    compute_levenshtein_based_match,
+    compute_reasoning_analysis_levenshtein_based_match,
+    add_missing_labels_in_if_error,
+    compute_reasoning_if_errors,
+    compute_pca_exact_match,
+    compute_pca_error_analysis,
+    score_instances,
+)
+SCORING_CONSTANTS = (
+    LEVENSHTEIN_DISTANCE_THRESHOLD,
+    LEVENSHTEIN_ERROR_SETS_DISTANCE_THRESHOLD,
+    REASONING_OR_IF_CANDIDATE_LENGTH_THRESHOLD,
+    LEVENSHTEIN_WEIGHTS,
+    POSTPROCESS_TABLE,
+    WHITESPACE_TABLE,
+    RESPONSE_PATTERN.pattern,
+    ANSWER_IS_DETECT_PATTERN.pattern,
+    ANSWER_IS_PATTERN.pattern,
+    metric_utils.EM_METRIC_FLAGS,
+    metric_utils.ANALYSIS_METRIC_FLAGS,
+    Levenshtein.__version__,
+)
+
+
+def get_scorer_version():
+    """
+    Digest of the source of SCORING_FUNCTIONS and of SCORING_CONSTANTS, part of
+    the score cache keys so that any change of the scoring scores the
+    instances again
+
+    Return:
+        str: scorer version
+    """
+    digest = hashlib.sha1()
+    for function in SCORING_FUNCTIONS:
+        digest.update(inspect.getsource(function).encode("utf8"))
+    digest.update(repr(SCORING_CONSTANTS).encode("utf8"))
+    return digest.hexdigest()
+
+
+SCORER_VERSION = get_scorer_version()
+
+
+def get_score_cache_path(cache_dir: str, file_path: str):
+    """
+    Score cache file of a results file, named after its absolute path
+
+    Parameters:
+        cache_dir (str): score cache folder
+        file_path (str): path to the all_results.jsonl file
+
+    Return:
+        Path: path to the score cache file
+    """
+    file_digest = hashlib.sha1(os.path.abspath(file_path).encode("utf8")).hexdigest()
+    return Path(cache_dir) / (file_digest + ".jsonl")
+
+
+def get_score_cache_keys(
+    instances: list, pca_instances_dict: dict, pca_label_instances_dict: dict
+):
+    """
+    Score cache key of every instance: its dataset, instruction_id and
+    dataset_input, and a digest of the scorer version, of the instance and of
+    the print_correct_answer(_label) instances it is scored against
+
+    Parameters:
+        instances (list): inference test instances
+        pca_instances_dict (dict): print_correct_answer instances by dataset_input
+        pca_label_instances_dict (dict): print_correct_answer_label instances by
+            dataset_input
+
+    Return:
+        list: (dataset, instruction_id, dataset_input, digest) of each instance
+    """
+    pca_digests = {}
+    cache_keys = []
+    for instance in instances:
+        dataset_input = instance.get("dataset_input")
+        if dataset_input not in pca_digests:
+            pca_digests[dataset_input] = dumps(
+                [
+                    pca_instances_dict.get(dataset_input),
+                    pca_label_instances_dict.get(dataset_input),
+                ]
+            )
+        digest = hashlib.sha1(
+            SCORER_VERSION.encode("utf8") + dumps(instance) + pca_digests[dataset_input]
+        ).hexdigest()
+        cache_keys.append(
+            (
+                instance.get("dataset"),
+                instance.get("instruction_id"),
+                dataset_input,
+                digest,
+            )
+        )
+    return cache_keys
+
+
+def load_score_cache(cache_path: Path):
+    """
+    Parameters:
+        cache_path (Path): path to the score cache file
+
+    Return:
+        dict: flags by score cache key, empty if the file does not exist
+    """
+    if not cache_path.exists():
+        return {}
+    return {
+        tuple(record[:4]): tuple(record[4]) for record in iter_jsonl(str(cache_path))
+    }
+
+
+def save_score_cache(cache_path: Path, score_cache: dict):
+    """
+    Write the score cache file, replacing the previous one only once it is complete
+
+    Parameters:
+        cache_path (Path): path to the score cache file
+        score_cache (dict): flags by score cache key
+    """
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = cache_path.with_suffix(".tmp")
+    with open(temp_path, "wb") as writer:
+        for cache_key, flags in score_cache.items():
+            writer.write(dumps([*cache_key, flags]) + b"\n")
+    os.replace(temp_path, cache_path)
+
+
+class ScoringJob:
+    """
+    Scoring of a results file. With a score cache, the flags of the instances
+    scored by a previous run are reused and only the other instances are scored.
+    They are submitted to the process pool right away if there is one,
+    else scored when the results are requested.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        cache_dir: str = None,
+        executor: ProcessPoolExecutor = None,
+        num_chunks: int = 1,
+    ):
+        self.file_path = file_path
+        (
+            self.instances,
+            self.pca_instances_dict,
+            self.pca_label_instances_dict,
+        ) = read_inference_results(file_path)
+
+        self.cache_path = None
+        self.cache_keys = None
+        self.score_cache = {}
+        self.pending = list(range(len(self.instances)))
+        if cache_dir is not None:
+            self.cache_path = get_score_cache_path(cache_dir, file_path)
+            self.score_cache = load_score_cache(self.cache_path)
+            self.cache_keys = get_score_cache_keys(
+                self.instances, self.pca_instances_dict, self.pca_label_instances_dict
+            )
+            self.pending = [
+                idx
+                for idx, cache_key in enumerate(self.cache_keys)
+                if cache_key not in self.score_cache
+            ]
+
+        self.futures = None
+        if executor is not None:
+            self.futures = submit_scoring(
+                executor,
+                [self.instances[idx] for idx in self.pending],
+                self.pca_instances_dict,
+                self.pca_label_instances_dict,
+                num_chunks,
+            )
+
+    def scored_instances(self):
+        """
+        Scores of the instances, in the order of the results file. The score
+        cache file is updated with the instances scored by this run, and the
+        instances no longer in the results file are dropped from it.
+
+        Return:
+            list: (MetricGroups, flags) of each scored instance, as in score_instances
+        """
+        pending_instances = [self.instances[idx] for idx in self.pending]
+        if self.futures is None:
+            pending_scores = score_instances(
+                pending_instances,
+                self.pca_instances_dict,
+                self.pca_label_instances_dict,
+            )
+        else:
+            pending_scores = [
+                scored_instance
+                for future in self.futures
+                for scored_instance in future.result()
+            ]
+
+        if self.cache_keys is None:
+            return [scores for scores in pending_scores if scores is not None]
+
+        scored_instances = [None] * len(self.instances)
+        for idx, cache_key in enumerate(self.cache_keys):
+            if cache_key in self.score_cache:
+                scored_instances[idx] = (
+                    metric_utils.get_metric_groups(cache_key[0], cache_key[1]),
+                    self.score_cache[cache_key],
+                )
+        for idx, scores in zip(self.pending, pending_scores):
+            scored_instances[idx] = scores
+
+        # instances that are skipped are not cached, they are scored again
+        score_cache = {
+            cache_key: scores[1]
+            for cache_key, scores in zip(self.cache_keys, scored_instances)
+            if scores is not None
+        }
+        if score_cache.keys() != self.score_cache.keys():
+            save_score_cache(self.cache_path, score_cache)
+        return [scores for scores in scored_instances if scores is not None]
 
 
 def main():
@@ -444,16 +1050,80 @@ def main():
         action=argparse.BooleanOptionalAction,
         help="Compute benchmark using loose scores"
     )
+    parser.add_argument(
+        "--metrics_backend",
+        default="python",
+        choices=list(metric_utils.METRIC_BACKENDS),
+        help="python updates the metric tables per instance, columnar computes "
+        "them as grouped sums with pandas, which is faster on large files",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Score instances in this many processes",
+    )
+    parser.add_argument(
+        "--cache",
+        default=True,
+        action=argparse.BooleanOptionalAction,
+        help="Reuse the scores of the instances unchanged since a previous run",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        default=DEFAULT_SCORE_CACHE_DIR,
+        help="Score cache folder, outside of the output folder by default",
+    )
+    parser.add_argument(
+        "--report_format",
+        "--report-format",
+        default="xlsx",
+        choices=metric_utils.REPORT_FORMATS,
+        help="xlsx writes a workbook of metric tables per model and if/noif file, "
+        "the other formats write each table once for every model, with model and "
+        "setting columns, without going through the Excel engine",
+    )
     args = parser.parse_args()
     with open(str(args.config)) as f:
         config_list = json.load(f)
 
-    final_benchmark_results = []
+    cache_dir = args.cache_dir if args.cache else None
+
+    executor = None
+    scoring_jobs = {}
+    # files of the config in the order they are processed, not submitted yet
+    unsubmitted_files = deque()
+    if args.workers > 1:
+        executor = ProcessPoolExecutor(max_workers=args.workers)
+        unsubmitted_files.extend(
+            dict.fromkeys(
+                file_path
+                for config_entry in config_list
+                for file_path in [
+                    config_entry.get("if_filepath"),
+                    config_entry.get("noif_filepath"),
+                ]
+                if file_path is not None
+            )
+        )
+
+    def submit_scoring_jobs():
+        # the next files are read and scored while the current one is processed,
+        # at most --workers of them so that memory does not grow with the config
+        while unsubmitted_files and len(scoring_jobs) < args.workers:
+            file_path = unsubmitted_files.popleft()
+            scoring_jobs[file_path] = ScoringJob(
+                file_path, cache_dir, executor, args.workers * CHUNKS_PER_WORKER
+            )
+
+    # tables of every model and if/noif file, for the leaderboard and the
+    # non xlsx report formats
+    combined_tables = {}
     for config_entry in tqdm(config_list, desc="Processing config.."):
         assert all(
             k in config_entry for k in ["if_filepath", "noif_filepath", "model"]
         ), "Missing key in config"
-        benchmark_dict = {}
         model_name = config_entry["model"]
         for idx, file_path in enumerate(
             [config_entry["if_filepath"], config_entry["noif_filepath"]]
@@ -463,175 +1133,76 @@ def main():
                 str(args.output_folder) + "/" + model_name + "_" + filename + ".xlsx"
             )
 
-            with open(file_path) as f:
-                inference_data = [json.loads(line) for line in f]
-            pca_instances_dict = {}
-            pca_label_instances_dict = {}
-            for instance in inference_data:
-                if instance["instruction_id"] not in [
-                    "print_correct_answer",
-                    "print_correct_answer_label",
-                ]:
-                    continue
-                if instance["instruction_id"] == "print_correct_answer":
-                    if instance["dataset_input"] not in pca_instances_dict:
-                        pca_instances_dict[instance["dataset_input"]] = instance
-                elif instance["instruction_id"] == "print_correct_answer_label":
-                    if instance["dataset_input"] not in pca_label_instances_dict:
-                        pca_label_instances_dict[instance["dataset_input"]] = instance
-
             print(f"processing file --- {file_path}")
-            with open(file_path) as f:
-                data = [json.loads(line) for line in f]
-
-            dataset_metrics = metric_utils.DatasetMetric(data)
-            instruction_metrics = metric_utils.InstructionMetric(data)
-            classification_metrics = metric_utils.ClassificationMetric(data)
-            data_instr_metrics = metric_utils.DatasetInstrMetric(data)
-            class_instr_metrics = metric_utils.ClassificationInstrMetric(data)
-            class_data_metrics = metric_utils.ClassificationDatasetMetric(data)
-            class_data_noif_metrics = metric_utils.ClassificationDatasetNoIFMetric(data)
-
-            category_mapping = metric_utils.CATEGORY_MAPPING()
-            datasets = metric_utils.DATASETS().datasets
-
-            for test_instance in data:
-                try:
-                    current_dataset = test_instance["dataset"]
-                    current_instruction = test_instance["instruction_id"]
-                    current_class = category_mapping.mapping[current_instruction]
-
-                    if (
-                        current_dataset in ["BoolQ", "Winogrande", "Piqa"]
-                        and current_class == "Operations on List"
-                    ):
-                        continue
-
-                    current_parent_dataset = ""
-                    current_dataset_input = test_instance["dataset_input"]
-                    print_correct_answer_instance = pca_instances_dict.get(
-                        current_dataset_input, {}
-                    )
-                    print_correct_answer_label_instance = pca_label_instances_dict.get(
-                        current_dataset_input, {}
-                    )
-
-                    for dset in datasets:
-                        if dset.lower() in current_dataset.lower():
-                            current_parent_dataset = dset
-                            break
-                    assert current_parent_dataset != ""
+            if executor is None:
+                scoring_job = ScoringJob(file_path, cache_dir)
+            else:
+                submit_scoring_jobs()
+                # a file listed again in the config is scored again
+                scoring_job = scoring_jobs.pop(file_path, None) or ScoringJob(
+                    file_path, cache_dir, executor, args.workers * CHUNKS_PER_WORKER
+                )
+                submit_scoring_jobs()
 
-                    em_metrics, analysis_metrics = {}, {}
-                    em_metrics["pca_count"] = (
-                        0 if print_correct_answer_instance == {} else 1
-                    )
-                    em_metrics["pca_label_count"] = (
-                        0 if print_correct_answer_label_instance == {} else 1
-                    )
-
-                    em_metrics = compute_exact_match(
-                        em_metrics,
-                        test_instance,
-                        print_correct_answer_instance,
-                        print_correct_answer_label_instance,
-                    )
-                    analysis_metrics = compute_reasoning_if_errors(
-                        analysis_metrics,
-                        test_instance,
-                        print_correct_answer_instance,
-                        print_correct_answer_label_instance,
-                        em_metrics["loose"],
-                    )
-
-                    dataset_metrics.update_metrics(
-                        current_dataset, em_metrics, analysis_metrics
-                    )
-                    instruction_metrics.update_metrics(
-                        current_instruction, em_metrics, analysis_metrics
-                    )
-                    classification_metrics.update_metrics(
-                        current_class, current_instruction, em_metrics, analysis_metrics
-                    )
-                    data_instr_metrics.update_metrics(
-                        current_dataset,
-                        current_instruction,
-                        em_metrics,
-                        analysis_metrics,
-                    )
-                    class_instr_metrics.update_metrics(
-                        current_class, current_instruction, em_metrics, analysis_metrics
-                    )
-                    class_data_metrics.update_metrics(
-                        current_class,
-                        current_parent_dataset,
-                        current_instruction,
-                        em_metrics,
-                        analysis_metrics,
-                    )
-                    class_data_noif_metrics.update_metrics(
-                        current_class,
-                        current_parent_dataset,
-                        current_instruction,
-                        em_metrics,
-                        analysis_metrics,
-                    )
-                except Exception as e:
-                    traceback.print_exc()
-                    continue
+            metric_tables = metric_utils.METRIC_BACKENDS[args.metrics_backend]()
+            for groups, flags in scoring_job.scored_instances():
+                metric_tables.update_metrics(groups, *split_metric_flags(flags))
+            # the instances of the file are released before the next one is read
+            del scoring_job
 
             try:
-                dataset_csv = dataset_metrics.return_metrics()
-                instruction_csv = instruction_metrics.return_metrics()
-                classification_csv = classification_metrics.return_metrics()
-                data_instr_csv = data_instr_metrics.return_metrics()
-                class_instr_csv = class_instr_metrics.return_metrics()
-                class_data_csv = class_data_metrics.return_metrics()
-                class_data_noif_csv = class_data_noif_metrics.return_metrics()
-
-                instr_df, class_df, class_data_df = metric_utils.write_result_xlsx(
-                    output_file,
-                    dataset_csv,
-                    instruction_csv,
-                    classification_csv,
-                    data_instr_csv,
-                    class_instr_csv,
-                    class_data_csv,
-                    class_data_noif_csv,
+                result_tables = metric_utils.build_result_tables(
+                    *metric_tables.return_metrics()
                 )
-                if idx == 0:
-                    (
-                        benchmark_dict["if_instr_df"],
-                        benchmark_dict["if_class_df"],
-                        benchmark_dict["if_class_data_df"],
-                    ) = (instr_df, class_df, class_data_df)
-                else:
-                    benchmark_dict["noif_instr_df"] = instr_df
+                if args.report_format == "xlsx":
+                    metric_utils.write_result_tables(output_file, result_tables)
+                for table_name, df in result_tables.items():
+                    combined_tables.setdefault(table_name, []).append(
+                        df.assign(model=model_name, setting=filename)
+                    )
             except Exception as e:
                 traceback.print_exc()
                 raise
-        try:
-            if args.loose == True:
-                benchmark_category = "loose"
-            else:
-                benchmark_category = "strict"
-            final_benchmark_results.append(
-                compute_benchmark_scores(
-                    model_name,
-                    benchmark_dict["if_instr_df"],
-                    benchmark_dict["noif_instr_df"],
-                    benchmark_dict["if_class_df"],
-                    benchmark_dict["if_class_data_df"],
-                    benchmark_category,
-                )
+
+    if executor is not None:
+        executor.shutdown()
+
+    for table_name, dfs in combined_tables.items():
+        combined_df = pd.concat(dfs, ignore_index=True)
+        # model and setting first, like the index of a cross-model table
+        combined_tables[table_name] = combined_df[
+            ["model", "setting"] + list(combined_df.columns[:-2])
+        ]
+        if args.report_format != "xlsx":
+            metric_utils.write_report_table(
+                combined_tables[table_name],
+                str(args.output_folder) + "/" + table_name + "." + args.report_format,
             )
-        except Exception as e:
-            traceback.print_exc()
-            print(f"Unable to compute benchmark score for {model_name}")
-            raise
 
-    benchmark_path = str(args.output_folder) + "/" + "benchmark.xlsx"
-    write_benchmark_results(final_benchmark_results, benchmark_path)
+    def setting_table(table_name, setting):
+        df = combined_tables[table_name]
+        return df[df["setting"] == setting]
+
+    try:
+        leaderboard = compute_leaderboard(
+            setting_table("instruction", "if"),
+            setting_table("instruction", "noif"),
+            setting_table("classification", "if"),
+            setting_table("classification_dataset", "if"),
+        )
+    except Exception as e:
+        traceback.print_exc()
+        print("Unable to compute the benchmark scores")
+        raise
+    if args.loose == True:
+        benchmark_category = "loose"
+    else:
+        benchmark_category = "strict"
+
+    benchmark_path = str(args.output_folder) + "/" + "benchmark." + args.report_format
+    write_benchmark_results(
+        leaderboard[leaderboard["category"] == benchmark_category], benchmark_path
+    )
 
 
 if __name__ == "__main__":
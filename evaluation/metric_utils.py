@@ -1,5 +1,9 @@
+from collections import namedtuple
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
 
@@ -176,6 +180,25 @@ class BaseMetric:
         self.pca_label_unclass += analysis_metrics["pca_label_unclass"]
         self.pca_label_unclass_count += analysis_metrics["pca_label_unclass"]
 
+    @classmethod
+    def from_sums(cls, num_instances: int, em_sums: dict, analysis_sums: dict):
+        """
+        BaseMetric of a group from the sums of its instances' metrics,
+        the same as updating it with every instance
+
+        Parameters:
+            num_instances (int): number of instances in the group
+            em_sums (dict): sum of each em_metrics value over the group
+            analysis_sums (dict): sum of each analysis_metrics value over the group
+
+        Return:
+            BaseMetric: metric of the group
+        """
+        metric = cls()
+        metric.update_metrics(em_sums, analysis_sums)
+        metric.num_instances = num_instances
+        return metric
+
     def return_metrics(self):
         if self.em_pca_count > 0:
             pca_strict_em = self.em_pca_strict / self.em_pca_count
@@ -230,15 +253,86 @@ class BaseMetric:
         ]
 
 
+PCA_INSTRUCTIONS = ["print_correct_answer", "print_correct_answer_label"]
+# datasets without "Operations on List" instructions in the benchmark
+NO_LIST_OPERATIONS_DATASETS = ["Piqa", "Winogrande", "BoolQ"]
+
+# em_metrics and analysis_metrics values accumulated by BaseMetric
+EM_METRIC_FLAGS = [
+    "strict",
+    "loose",
+    "pca_strict",
+    "pca_loose",
+    "pca_count",
+    "pca_label_strict",
+    "pca_label_loose",
+    "pca_label_count",
+]
+ANALYSIS_METRIC_FLAGS = [
+    "reason_strict",
+    "reason_loose",
+    "if_strict",
+    "if_loose",
+    "unclass_strict",
+    "unclass_loose",
+    "pca_reason",
+    "pca_if",
+    "pca_unclass",
+    "pca_label_reason",
+    "pca_label_if",
+    "pca_label_unclass",
+]
+
+MetricGroups = namedtuple(
+    "MetricGroups", ["dataset", "instruction", "classification", "parent_dataset"]
+)
+
+
+@lru_cache(maxsize=None)
+def get_parent_dataset(dataset: str) -> str:
+    """
+    Parent dataset of a dataset, e.g. MMLUPro for MMLUPro_law
+
+    Parameters:
+        dataset (str): dataset name
+
+    Return:
+        str: first of DATASETS contained in the dataset name, ignoring case,
+        or "" if there is none
+    """
+    for parent_dataset in DATASETS.datasets:
+        if parent_dataset.lower() in dataset.lower():
+            return parent_dataset
+    return ""
+
+
+@lru_cache(maxsize=None)
+def get_metric_groups(dataset: str, instruction: str) -> MetricGroups:
+    """
+    Groups of the metric tables an instance belongs to, computed once
+    per (dataset, instruction) pair
+
+    Parameters:
+        dataset (str): dataset of the instance
+        instruction (str): instruction_id of the instance
+
+    Return:
+        MetricGroups: dataset, instruction, classification and parent dataset
+    """
+    classification = CATEGORY_MAPPING.mapping[instruction]
+    parent_dataset = get_parent_dataset(dataset)
+    assert parent_dataset != ""
+    return MetricGroups(dataset, instruction, classification, parent_dataset)
+
+
 class DatasetMetric:
-    def __init__(self, data):
+    def __init__(self, data=None):
+        # created on the first update of each dataset, data is not needed
         self.metrics = {}
-        unique_datasets = [tst["dataset"] for tst in data]
-        unique_datasets = list(set(unique_datasets))
-        for dataset in unique_datasets:
-            self.metrics[dataset] = BaseMetric()
 
     def update_metrics(self, dataset: str, em_metrics: dict, analysis_metrics: dict):
+        if dataset not in self.metrics:
+            self.metrics[dataset] = BaseMetric()
         self.metrics[dataset].update_metrics(em_metrics, analysis_metrics)
 
     def return_metrics(self):
@@ -251,16 +345,14 @@ class DatasetMetric:
 
 
 class InstructionMetric:
-    def __init__(self, data):
+    def __init__(self, data=None):
         self.metrics = {}
-        unique_instructions = [tst["instruction_id"] for tst in data]
-        unique_instructions = list(set(unique_instructions))
-        for instruction in unique_instructions:
-            self.metrics[instruction] = BaseMetric()
 
     def update_metrics(
         self, instruction: str, em_metrics: dict, analysis_metrics: dict
     ):
+        if instruction not in self.metrics:
+            self.metrics[instruction] = BaseMetric()
         self.metrics[instruction].update_metrics(em_metrics, analysis_metrics)
 
     def return_metrics(self):
@@ -273,23 +365,8 @@ class InstructionMetric:
 
 
 class ClassificationMetric:
-    def __init__(self, data):
+    def __init__(self, data=None):
         self.metrics = {}
-        category_map = CATEGORY_MAPPING()
-        unique_classes = [
-            category_map.mapping[tst["instruction_id"]]
-            for tst in data
-            if tst["instruction_id"]
-            not in ["print_correct_answer_label", "print_correct_answer"]
-        ]
-        unique_classes = list(set(unique_classes))
-        if any(tst["instruction_id"] == "print_correct_answer_label" for tst in data):
-            unique_classes.append("print_correct_answer_label")
-        if any(tst["instruction_id"] == "print_correct_answer" for tst in data):
-            unique_classes.append("print_correct_answer")
-
-        for classification in unique_classes:
-            self.metrics[classification] = BaseMetric()
 
     def update_metrics(
         self,
@@ -298,13 +375,10 @@ class ClassificationMetric:
         em_metrics: dict,
         analysis_metrics: dict,
     ):
-        if classification in self.metrics.keys() or instruction in self.metrics.keys():
-            key = (
-                instruction
-                if instruction in ["print_correct_answer", "print_correct_answer_label"]
-                else classification
-            )
-            self.metrics[key].update_metrics(em_metrics, analysis_metrics)
+        key = instruction if instruction in PCA_INSTRUCTIONS else classification
+        if key not in self.metrics:
+            self.metrics[key] = BaseMetric()
+        self.metrics[key].update_metrics(em_metrics, analysis_metrics)
 
     def return_metrics(self):
         table_metrics = []
@@ -316,33 +390,19 @@ class ClassificationMetric:
 
 
 class DatasetInstrMetric:
-    def __init__(self, data):
+    def __init__(self, data=None):
         self.metrics = {}
-        category_map = CATEGORY_MAPPING().mapping
-        unique_datasets = [tst["dataset"] for tst in data]
-        unique_datasets = list(set(unique_datasets))
-        for dataset in unique_datasets:
-            subset = list(filter(lambda d: d["dataset"] == dataset, data))
-            unique_instructions = [tst["instruction_id"] for tst in subset]
-            unique_instructions = list(set(unique_instructions))
-            if len(unique_instructions) > 0:
-                self.metrics[dataset] = {}
-            for instruction in unique_instructions:
-                if (
-                    dataset in ["Piqa", "BoolQ", "Winogrande"]
-                    and category_map[instruction] == "Operations on List"
-                ):
-                    continue
-                self.metrics[dataset][instruction] = BaseMetric()
 
     def update_metrics(self, dataset, instruction, em_metrics, analysis_metrics):
         if (
-            dataset in self.metrics.keys()
-            and instruction in self.metrics[dataset].keys()
+            dataset in NO_LIST_OPERATIONS_DATASETS
+            and CATEGORY_MAPPING.mapping[instruction] == "Operations on List"
         ):
-            self.metrics[dataset][instruction].update_metrics(
-                em_metrics, analysis_metrics
-            )
+            return
+        dataset_metrics = self.metrics.setdefault(dataset, {})
+        if instruction not in dataset_metrics:
+            dataset_metrics[instruction] = BaseMetric()
+        dataset_metrics[instruction].update_metrics(em_metrics, analysis_metrics)
 
     def return_metrics(self):
         table_metrics = []
@@ -356,35 +416,14 @@ class DatasetInstrMetric:
 
 
 class ClassificationInstrMetric:
-    def __init__(self, data):
+    def __init__(self, data=None):
         self.metrics = {}
-        category_map = CATEGORY_MAPPING()
-        unique_classes = [category_map.mapping[tst["instruction_id"]] for tst in data]
-        unique_classes = list(set(unique_classes))
-
-        for classification in unique_classes:
-            subset = list(
-                filter(
-                    lambda d: category_map.mapping[d["instruction_id"]]
-                    == classification,
-                    data,
-                )
-            )
-            unique_instructions = [tst["instruction_id"] for tst in subset]
-            unique_instructions = list(set(unique_instructions))
-            if len(unique_instructions) > 0:
-                self.metrics[classification] = {}
-            for instruction in unique_instructions:
-                self.metrics[classification][instruction] = BaseMetric()
 
     def update_metrics(self, classification, instruction, em_metrics, analysis_metrics):
-        if (
-            classification in self.metrics.keys()
-            and instruction in self.metrics[classification].keys()
-        ):
-            self.metrics[classification][instruction].update_metrics(
-                em_metrics, analysis_metrics
-            )
+        classification_metrics = self.metrics.setdefault(classification, {})
+        if instruction not in classification_metrics:
+            classification_metrics[instruction] = BaseMetric()
+        classification_metrics[instruction].update_metrics(em_metrics, analysis_metrics)
 
     def return_metrics(self):
         table_metrics = []
@@ -398,73 +437,22 @@ class ClassificationInstrMetric:
 
 
 class ClassificationDatasetMetric:
-    def __init__(self, data):
+    def __init__(self, data=None):
         self.metrics = {}
-        category_map = CATEGORY_MAPPING()
-        datasets = DATASETS().datasets
-
-        unique_classes = [
-            category_map.mapping[tst["instruction_id"]]
-            for tst in data
-            if tst["instruction_id"]
-            not in ["print_correct_answer_label", "print_correct_answer"]
-        ]
-        unique_classes = list(set(unique_classes))
-        if any(tst["instruction_id"] == "print_correct_answer_label" for tst in data):
-            unique_classes.append("print_correct_answer_label")
-        if any(tst["instruction_id"] == "print_correct_answer" for tst in data):
-            unique_classes.append("print_correct_answer")
-
-        for classification in unique_classes:
-            if classification == "print_correct_answer_label":
-                subset = list(
-                    filter(lambda d: d["instruction_id"] == classification, data)
-                )
-            elif classification == "print_correct_answer":
-                subset = list(
-                    filter(lambda d: d["instruction_id"] == classification, data)
-                )
-            else:
-                subset = list(
-                    filter(
-                        lambda d: category_map.mapping[d["instruction_id"]]
-                        == classification,
-                        data,
-                    )
-                )
-            unique_dataset = [tst["dataset"] for tst in subset]
-            parent_level_unique_dataset = []
-            for dset in unique_dataset:
-                for dataset in datasets:
-                    if dataset in dset:
-                        parent_level_unique_dataset.append(dataset)
-                        break
-            unique_dataset = list(set(parent_level_unique_dataset))
-
-            if len(unique_dataset) > 0:
-                self.metrics[classification] = {}
-            for dataset in unique_dataset:
-                if classification == "Operations on List" and dataset in [
-                    "Piqa",
-                    "Winogrande",
-                    "BoolQ",
-                ]:
-                    continue
-                self.metrics[classification][dataset] = BaseMetric()
 
     def update_metrics(
         self, classification, parent_dataset, instruction, em_metrics, analysis_metrics
     ):
-        if classification in self.metrics.keys() or instruction in self.metrics.keys():
-            key = (
-                instruction
-                if instruction in ["print_correct_answer", "print_correct_answer_label"]
-                else classification
-            )
-            if parent_dataset in self.metrics[key].keys():
-                self.metrics[key][parent_dataset].update_metrics(
-                    em_metrics, analysis_metrics
-                )
+        key = instruction if instruction in PCA_INSTRUCTIONS else classification
+        if parent_dataset not in DATASETS.datasets or (
+            key == "Operations on List"
+            and parent_dataset in NO_LIST_OPERATIONS_DATASETS
+        ):
+            return
+        key_metrics = self.metrics.setdefault(key, {})
+        if parent_dataset not in key_metrics:
+            key_metrics[parent_dataset] = BaseMetric()
+        key_metrics[parent_dataset].update_metrics(em_metrics, analysis_metrics)
 
     def return_metrics(self):
         table_metrics = []
@@ -477,88 +465,198 @@ class ClassificationDatasetMetric:
         return table_metrics
 
 
-class ClassificationDatasetNoIFMetric:
-    def __init__(self, data):
-        self.metrics = {}
-        category_map = CATEGORY_MAPPING()
-        datasets = DATASETS().datasets
-
-        unique_classes = [
-            category_map.mapping[tst["instruction_id"]]
-            for tst in data
-            if tst["instruction_id"]
-            not in ["print_correct_answer_label", "print_correct_answer"]
+class ClassificationDatasetNoIFMetric(ClassificationDatasetMetric):
+    pass
+
+
+class MetricTables:
+    """
+    The seven metric tables of a results file, updated together
+    """
+
+    def __init__(self):
+        self.dataset_metrics = DatasetMetric()
+        self.instruction_metrics = InstructionMetric()
+        self.classification_metrics = ClassificationMetric()
+        self.data_instr_metrics = DatasetInstrMetric()
+        self.class_instr_metrics = ClassificationInstrMetric()
+        self.class_data_metrics = ClassificationDatasetMetric()
+        self.class_data_noif_metrics = ClassificationDatasetNoIFMetric()
+
+    def update_metrics(
+        self, groups: MetricGroups, em_metrics: dict, analysis_metrics: dict
+    ):
+        self.dataset_metrics.update_metrics(
+            groups.dataset, em_metrics, analysis_metrics
+        )
+        self.instruction_metrics.update_metrics(
+            groups.instruction, em_metrics, analysis_metrics
+        )
+        self.classification_metrics.update_metrics(
+            groups.classification, groups.instruction, em_metrics, analysis_metrics
+        )
+        self.data_instr_metrics.update_metrics(
+            groups.dataset, groups.instruction, em_metrics, analysis_metrics
+        )
+        self.class_instr_metrics.update_metrics(
+            groups.classification, groups.instruction, em_metrics, analysis_metrics
+        )
+        self.class_data_metrics.update_metrics(
+            groups.classification,
+            groups.parent_dataset,
+            groups.instruction,
+            em_metrics,
+            analysis_metrics,
+        )
+        self.class_data_noif_metrics.update_metrics(
+            groups.classification,
+            groups.parent_dataset,
+            groups.instruction,
+            em_metrics,
+            analysis_metrics,
+        )
+
+    def return_metrics(self):
+        """
+        Return:
+            list: rows of the seven tables, in the argument order of build_result_tables
+        """
+        return [
+            self.dataset_metrics.return_metrics(),
+            self.instruction_metrics.return_metrics(),
+            self.classification_metrics.return_metrics(),
+            self.data_instr_metrics.return_metrics(),
+            self.class_instr_metrics.return_metrics(),
+            self.class_data_metrics.return_metrics(),
+            self.class_data_noif_metrics.return_metrics(),
         ]
-        unique_classes = list(set(unique_classes))
-        if any(tst["instruction_id"] == "print_correct_answer_label" for tst in data):
-            unique_classes.append("print_correct_answer_label")
-        if any(tst["instruction_id"] == "print_correct_answer" for tst in data):
-            unique_classes.append("print_correct_answer")
-
-        for classification in unique_classes:
-            if classification == "print_correct_answer":
-                subset = list(
-                    filter(lambda d: d["instruction_id"] == classification, data)
-                )
-            elif classification == "print_correct_answer_label":
-                subset = list(
-                    filter(lambda d: d["instruction_id"] == classification, data)
-                )
-            else:
-                subset = list(
-                    filter(
-                        lambda d: category_map.mapping[d["instruction_id"]]
-                        == classification,
-                        data,
-                    )
-                )
-            unique_dataset = [tst["dataset"] for tst in subset]
-            parent_level_unique_dataset = []
-            for dset in unique_dataset:
-                for dataset in datasets:
-                    if dataset in dset:
-                        parent_level_unique_dataset.append(dataset)
-                        break
-            unique_dataset = list(set(parent_level_unique_dataset))
-
-            if len(unique_dataset) > 0:
-                self.metrics[classification] = {}
-            for dataset in unique_dataset:
-                if classification == "Operations on List" and dataset in [
-                    "Piqa",
-                    "Winogrande",
-                    "BoolQ",
-                ]:
-                    continue
-                self.metrics[classification][dataset] = BaseMetric()
+
+
+class ColumnarMetricTables:
+    """
+    The same seven tables as MetricTables, computed as grouped sums instead of
+    updating seven BaseMetric objects per instance. Each update only records the
+    instance's flags and the code of its (dataset, instruction) group, the flags
+    are summed per group with numpy, and each table sums the groups it spans
+    """
+
+    FLAG_COLUMNS = EM_METRIC_FLAGS + ANALYSIS_METRIC_FLAGS
+
+    def __init__(self):
+        # MetricGroups to group code, in order of first appearance
+        self.group_codes = {}
+        self.codes = []
+        self.flags = []
+        self.get_em_flags = itemgetter(*EM_METRIC_FLAGS)
+        self.get_analysis_flags = itemgetter(*ANALYSIS_METRIC_FLAGS)
 
     def update_metrics(
-        self, classification, parent_dataset, instruction, em_metrics, analysis_metrics
+        self, groups: MetricGroups, em_metrics: dict, analysis_metrics: dict
     ):
-        if classification in self.metrics.keys() or instruction in self.metrics.keys():
-            key = (
-                instruction
-                if instruction in ["print_correct_answer", "print_correct_answer_label"]
-                else classification
+        self.codes.append(self.group_codes.setdefault(groups, len(self.group_codes)))
+        self.flags.append(
+            self.get_em_flags(em_metrics) + self.get_analysis_flags(analysis_metrics)
+        )
+
+    def group_metrics(self, frame: pd.DataFrame, keys: list):
+        """
+        Rows of a table grouped by the given columns
+
+        Parameters:
+            frame (pd.DataFrame): flag sums and instance count of each group
+            keys (list): one or two group columns
+
+        Return:
+            list: table rows, the group keys followed by BaseMetric.return_metrics
+        """
+        sums = frame.groupby(keys, sort=False)[
+            ["num_instances"] + self.FLAG_COLUMNS
+        ].sum()
+        if len(keys) == 2:
+            # rows of the same first key together, like the nested dicts of MetricTables
+            first_key_order = {
+                key: order for order, key in enumerate(pd.unique(frame[keys[0]]))
+            }
+            sums = sums.sort_index(
+                level=0,
+                key=lambda index: index.map(first_key_order),
+                kind="stable",
+                sort_remaining=False,
             )
-            if parent_dataset in self.metrics[key].keys():
-                self.metrics[key][parent_dataset].update_metrics(
-                    em_metrics, analysis_metrics
-                )
 
-    def return_metrics(self):
+        num_em_flags = len(EM_METRIC_FLAGS)
         table_metrics = []
-        for cat in list(self.metrics.keys()):
-            for dset in list(self.metrics[cat].keys()):
-                metric = self.metrics[cat][dset].return_metrics()
-                metric.insert(0, dset)
-                metric.insert(0, cat)
-                table_metrics.append(metric)
+        for group_keys, (num_instances, *flag_sums) in zip(
+            sums.index, sums.values.tolist()
+        ):
+            metric = BaseMetric.from_sums(
+                num_instances,
+                dict(zip(EM_METRIC_FLAGS, flag_sums[:num_em_flags])),
+                dict(zip(ANALYSIS_METRIC_FLAGS, flag_sums[num_em_flags:])),
+            ).return_metrics()
+            if len(keys) == 1:
+                group_keys = (group_keys,)
+            table_metrics.append(list(group_keys) + metric)
         return table_metrics
 
+    def return_metrics(self):
+        """
+        Return:
+            list: rows of the seven tables, in the argument order of build_result_tables
+        """
+        num_groups = len(self.group_codes)
+        codes = np.asarray(self.codes, dtype=np.int64)
+        flags = np.asarray(self.flags, dtype=np.int64).reshape(
+            len(self.codes), len(self.FLAG_COLUMNS)
+        )
+        flag_sums = np.zeros((num_groups, len(self.FLAG_COLUMNS)), dtype=np.int64)
+        np.add.at(flag_sums, codes, flags)
+
+        # one row per (dataset, instruction) group, in order of first appearance
+        frame = pd.DataFrame.from_records(
+            list(self.group_codes), columns=list(MetricGroups._fields)
+        )
+        frame["num_instances"] = np.bincount(codes, minlength=num_groups)
+        frame[self.FLAG_COLUMNS] = flag_sums
+        # print_correct_answer(_label) instances have their own classification rows
+        frame["key"] = frame["instruction"].where(
+            frame["instruction"].isin(PCA_INSTRUCTIONS), frame["classification"]
+        )
+
+        data_instr_frame = frame[
+            ~(
+                frame["dataset"].isin(NO_LIST_OPERATIONS_DATASETS)
+                & (frame["classification"] == "Operations on List")
+            )
+        ]
+        class_data_frame = frame[
+            frame["parent_dataset"].isin(DATASETS.datasets)
+            & ~(
+                (frame["key"] == "Operations on List")
+                & frame["parent_dataset"].isin(NO_LIST_OPERATIONS_DATASETS)
+            )
+        ]
+        class_data_csv = self.group_metrics(class_data_frame, ["key", "parent_dataset"])
+        return [
+            self.group_metrics(frame, ["dataset"]),
+            self.group_metrics(frame, ["instruction"]),
+            self.group_metrics(frame, ["key"]),
+            self.group_metrics(data_instr_frame, ["dataset", "instruction"]),
+            self.group_metrics(frame, ["classification", "instruction"]),
+            class_data_csv,
+            [list(row) for row in class_data_csv],
+        ]
+
+
+# --metrics_backend of compute_metrics
+METRIC_BACKENDS = {"python": MetricTables, "columnar": ColumnarMetricTables}
 
-def write_result_xlsx(
-    output_file,
+
+# formats of the metric tables and the benchmark written by compute_metrics
+REPORT_FORMATS = ["xlsx", "csv", "parquet", "json"]
+
+
+def build_result_tables(
     dataset_csv,
     instruction_csv,
     classification_csv,
@@ -567,66 +665,91 @@ def write_result_xlsx(
     class_data_csv,
     class_data_noif_csv,
 ):
+    """
+    Build the metric tables of a results file from the rows of return_metrics
+
+    Parameters:
+        dataset_csv ... class_data_noif_csv (list): rows of each table, as
+        returned by return_metrics
+
+    Return:
+        dict: DataFrame of each table by sheet name, in the order of the xlsx sheets
+    """
     table_headers = TABLE_HEADERS().headers
     category_table_ordering = TABLE_ORDERING().categories
 
-    path = Path(output_file)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    writer = pd.ExcelWriter(output_file, engine="xlsxwriter")
-    dataset_headers = ["dataset"] + table_headers
-    data_df = pd.DataFrame(dataset_csv, columns=dataset_headers)
-    data_df.to_excel(writer, sheet_name="dataset", index=False)
-
-    instruction_headers = ["instruction"] + table_headers
-    instr_df = pd.DataFrame(instruction_csv, columns=instruction_headers)
-    instr_df.to_excel(writer, sheet_name="instruction", index=False)
-
-    classification_headers = ["classification"] + table_headers
-    class_df = pd.DataFrame(classification_csv, columns=classification_headers)
-    class_df["classification"] = pd.Categorical(
-        class_df["classification"], ordered=True, categories=category_table_ordering
+    def sort_by_classification(df):
+        df["classification"] = pd.Categorical(
+            df["classification"], ordered=True, categories=category_table_ordering
+        )
+        return df.sort_values("classification")
+
+    result_tables = {}
+    result_tables["dataset"] = pd.DataFrame(
+        dataset_csv, columns=["dataset"] + table_headers
     )
-    class_df = class_df.sort_values("classification")
-    class_df.to_excel(writer, sheet_name="classification", index=False)
-
-    data_instr_headers = ["dataset", "instruction"] + table_headers
-    data_instr_df = pd.DataFrame(data_instr_csv, columns=data_instr_headers)
-    data_instr_df.to_excel(writer, sheet_name="dataset_instructions", index=False)
-
-    class_instr_headers = ["classification", "instruction"] + table_headers
-    class_instr_df = pd.DataFrame(class_instr_csv, columns=class_instr_headers)
-    class_instr_df["classification"] = pd.Categorical(
-        class_instr_df["classification"],
-        ordered=True,
-        categories=category_table_ordering,
+    result_tables["instruction"] = pd.DataFrame(
+        instruction_csv, columns=["instruction"] + table_headers
     )
-    class_instr_df = class_instr_df.sort_values("classification")
-    class_instr_df.to_excel(
-        writer, sheet_name="classification_instructions", index=False
+    result_tables["classification"] = sort_by_classification(
+        pd.DataFrame(classification_csv, columns=["classification"] + table_headers)
     )
-
-    class_data_headers = ["classification", "dataset"] + table_headers
-    class_data_df = pd.DataFrame(class_data_csv, columns=class_data_headers)
-    class_data_df["classification"] = pd.Categorical(
-        class_data_df["classification"],
-        ordered=True,
-        categories=category_table_ordering,
+    result_tables["dataset_instructions"] = pd.DataFrame(
+        data_instr_csv, columns=["dataset", "instruction"] + table_headers
     )
-    class_data_df = class_data_df.sort_values("classification")
-    class_data_df.to_excel(writer, sheet_name="classification_dataset", index=False)
-
-    class_data_noif_headers = ["classification", "dataset"] + table_headers
-    class_data_noif_df = pd.DataFrame(
-        class_data_noif_csv, columns=class_data_noif_headers
+    result_tables["classification_instructions"] = sort_by_classification(
+        pd.DataFrame(
+            class_instr_csv, columns=["classification", "instruction"] + table_headers
+        )
     )
-    class_data_noif_df["classification"] = pd.Categorical(
-        class_data_noif_df["classification"],
-        ordered=True,
-        categories=category_table_ordering,
+    result_tables["classification_dataset"] = sort_by_classification(
+        pd.DataFrame(
+            class_data_csv, columns=["classification", "dataset"] + table_headers
+        )
     )
-    class_data_noif_df = class_data_noif_df.sort_values("classification")
-    class_data_noif_df.to_excel(
-        writer, sheet_name="noif_classification_dataset", index=False
+    result_tables["noif_classification_dataset"] = sort_by_classification(
+        pd.DataFrame(
+            class_data_noif_csv, columns=["classification", "dataset"] + table_headers
+        )
     )
+    return result_tables
+
+
+def write_result_tables(output_file, result_tables):
+    """
+    Write the metric tables of build_result_tables as the sheets of an xlsx file
+
+    Parameters:
+        output_file (str): xlsx file path
+        result_tables (dict): DataFrame of each sheet by sheet name
+    """
+    path = Path(output_file)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer = pd.ExcelWriter(output_file, engine="xlsxwriter")
+    for sheet_name, df in result_tables.items():
+        df.to_excel(writer, sheet_name=sheet_name, index=False)
     writer.close()
-    return instr_df, class_df, class_data_df
+
+
+def write_report_table(df, output_file):
+    """
+    Write a table in the REPORT_FORMATS format given by the output file extension,
+    only xlsx goes through the Excel engine
+
+    Parameters:
+        df (pd.DataFrame): table to write
+        output_file (str): file path ending in .xlsx, .csv, .parquet or .json
+    """
+    path = Path(output_file)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    report_format = path.suffix[1:]
+    if report_format == "csv":
+        df.to_csv(path, index=False)
+    elif report_format == "parquet":
+        df.to_parquet(path, index=False)
+    elif report_format == "json":
+        df.to_json(path, orient="records", indent=1)
+    elif report_format == "xlsx":
+        df.to_excel(path, index=False)
+    else:
+        raise ValueError(f"Unsupported report format: {report_format}")
@@ -1,3 +1,12 @@
+import importlib
+
 from . import hf_to_schema
-from . import instruction
 from . import constants
+
+
+def __getattr__(name: str):
+    # the instruction modules set the locale on import, so they are imported
+    # on first access rather than with the package
+    if name == "instruction":
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
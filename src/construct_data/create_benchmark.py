@@ -5,19 +5,25 @@ import importlib
 import traceback
 from tqdm import tqdm
 from constants import SCHEMA_KEYS
+from ir_cache import DEFAULT_IR_CACHE_DIR, get_intermediate_representation
 from functools import partial
 import sys
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
+from construct_data.hf_to_schema import get_loader_info  # noqa: E402
 
-def create_input_from_dataset(example: dict, COT=False):
+
+def create_input_from_dataset(example: dict, COT=False, QUESTION_FIRST=False):
     """Transform HF dataset into the schema
 
     Args:
         example (dict): an instance of HF dataset
         COT (bool, optional): Use CoT prompts. Defaults to False.
+        QUESTION_FIRST (bool, optional): Place the question and the options
+            before the instruction, so that the prompts of every instruction
+            applied to the same question share a prefix. Defaults to False.
 
     Returns:
         _type_: an instance of HF dataset transformed to our schema
@@ -35,16 +41,22 @@ def create_input_from_dataset(example: dict, COT=False):
     else:
         choices_as_text = ""
     if COT:
+        task_instruction = example[SCHEMA_KEYS.COT_INSTRUCTION.value].strip()
+    else:
+        task_instruction = example[
+            SCHEMA_KEYS.FINAL_PREFIX_TASK_INSTRUCTION.value
+        ].strip()
+    if QUESTION_FIRST:
         example["input"] = (
-            example[SCHEMA_KEYS.COT_INSTRUCTION.value].strip()
-            + "\n"
-            + example[SCHEMA_KEYS.INPUT_INSTANCE.value]
+            example[SCHEMA_KEYS.INPUT_INSTANCE.value]
             + choices_as_text
+            + "\n"
+            + task_instruction
             + example[SCHEMA_KEYS.FINAL_SUFFIX_TASK_INSTRUCTION.value]
         )
     else:
         example["input"] = (
-            example[SCHEMA_KEYS.FINAL_PREFIX_TASK_INSTRUCTION.value].strip()
+            task_instruction
             + "\n"
             + example[SCHEMA_KEYS.INPUT_INSTANCE.value]
             + choices_as_text
@@ -167,6 +179,30 @@ def write_data(
     return total_number_of_instances, total_number_of_words
 
 
+def split_dataset_name(dataset_key: str):
+    """Loader name and category of a dataset of the config, e.g. MMLUPro_law
+
+    Args:
+        dataset_key (str): dataset name in the config
+
+    Raises:
+        ValueError: for unknown loaders and categories, or a missing category
+
+    Returns:
+        tuple: loader name, category or None
+    """
+    dataset_name, _, category = dataset_key.partition("_")
+    categories = get_loader_info(dataset_name)["categories"]
+    if not category and not categories:
+        return dataset_name, None
+    if category not in categories:
+        raise ValueError(
+            f"Unknown dataset {dataset_key}, available datasets: "
+            f"{[f'{dataset_name}_{each_category}' for each_category in categories]}"
+        )
+    return dataset_name, category
+
+
 def main():
     parser = argparse.ArgumentParser(description="Construct KCIFmark")
     parser.add_argument("--config", help="Dataset name", required=True)
@@ -178,6 +214,33 @@ def main():
         default=False,
         action=argparse.BooleanOptionalAction,
     )
+    parser.add_argument(
+        "--question_first",
+        help="Place the question before the instruction to share prompt prefixes",
+        type=bool,
+        default=False,
+        action=argparse.BooleanOptionalAction,
+    )
+    parser.add_argument(
+        "--ir_cache",
+        help="Reuse the intermediate representations cached by previous runs",
+        type=bool,
+        default=True,
+        action=argparse.BooleanOptionalAction,
+    )
+    parser.add_argument(
+        "--ir_cache_dir",
+        help="Folder of the cached intermediate representations",
+        default=DEFAULT_IR_CACHE_DIR,
+    )
+    parser.add_argument(
+        "--refresh_ir_cache",
+        help="Rebuild the cached intermediate representations, "
+        "e.g. after a dataset update on the Hub",
+        type=bool,
+        default=False,
+        action=argparse.BooleanOptionalAction,
+    )
     parser.add_argument(
         "--debug",
         help="Debugging the schema creation",
@@ -192,6 +255,11 @@ def main():
     with open(args.config, "r", errors="ignore", encoding="utf8") as reader:
         config = json.load(reader)
 
+    # check every dataset of the config before loading any of them
+    dataset_names = {
+        each_dataset: split_dataset_name(each_dataset) for each_dataset in config
+    }
+
     from datasets import disable_caching
 
     disable_caching()
@@ -209,8 +277,9 @@ def main():
 
     stats_by_dataset_instruction = {}
 
-    original_dataset = None
+    original_intermediate_representation = None
     original_dataset_name = ""
+    ir_cache_dir = args.ir_cache_dir if args.ir_cache else None
 
     total_number_of_instances = 0
     total_number_of_words = 0
@@ -221,33 +290,22 @@ def main():
         instances_by_instruction_follow = {}
         instances_by_instruction_no_follow = {}
 
-        # for every instruction
-        try:
-            dataset_name, category = each_dataset.split("_", 1)
-        except ValueError:
-            dataset_name = each_dataset
-            category = None
+        dataset_name, category = dataset_names[each_dataset]
 
         if original_dataset_name != dataset_name:
-            # Before applying instruction, let's clone the dataset
             print(f"Importing dataset class {dataset_name}")
-            module = importlib.import_module(
-                f"construct_data.hf_to_schema.{dataset_name}"
+            original_intermediate_representation = get_intermediate_representation(
+                dataset_name, ir_cache_dir, args.refresh_ir_cache
             )
-            class_def = getattr(module, dataset_name)
-
-            # Create a new dataset
-            original_dataset = class_def()
             original_dataset_name = dataset_name
 
-        import copy
-
-        dataset = copy.deepcopy(original_dataset)
+        # the intermediate representation is shared by every instruction and is
+        # never modified: map returns a new dataset for every transformation, its
+        # functions are given fresh copies of the instances
+        intermediate_representation = original_intermediate_representation
         if category is not None:
-            dataset.intermediate_representation = dataset.intermediate_representation[
-                each_dataset
-            ]
-            assert len(dataset.intermediate_representation) > 0
+            intermediate_representation = intermediate_representation[each_dataset]
+            assert len(intermediate_representation) > 0
 
         # for every instruction transformation
         for each_instruction in config[each_dataset]:
@@ -255,18 +313,6 @@ def main():
                 instances_by_instruction_follow[each_instruction] = {}
                 instances_by_instruction_no_follow[each_instruction] = {}
 
-            # we clone the dataset and apply transformation
-            import copy
-
-            dataset = copy.deepcopy(original_dataset)
-
-            # select the subset
-            if category is not None:
-                dataset.intermediate_representation = (
-                    dataset.intermediate_representation[each_dataset]
-                )
-                assert len(dataset.intermediate_representation) > 0
-
             module = importlib.import_module(
                 f"construct_data.instruction.{each_instruction}"
             )
@@ -274,26 +320,26 @@ def main():
 
             try:
                 # apply the instruction transformation
-                dataset.intermediate_representation = dataset.intermediate_representation.map(
+                instruction_dataset = intermediate_representation.map(
                     instruction_function,
                     desc=f"Applying {each_instruction} transformation on dataset {each_dataset}",
                     num_proc=8,
                 )
 
                 # get input and output fields
-                dataset.intermediate_representation = (
-                    dataset.intermediate_representation.map(
-                        partial(create_input_from_dataset, COT=args.cot),
-                        desc=f"Creating Input for dataset {each_dataset}...",
-                        num_proc=8,
-                    )
+                instruction_dataset = instruction_dataset.map(
+                    partial(
+                        create_input_from_dataset,
+                        COT=args.cot,
+                        QUESTION_FIRST=args.question_first,
+                    ),
+                    desc=f"Creating Input for dataset {each_dataset}...",
+                    num_proc=8,
                 )
 
-                dataset.intermediate_representation = (
-                    dataset.intermediate_representation.shuffle(seed=42)
-                )
+                instruction_dataset = instruction_dataset.shuffle(seed=42)
 
-                for each_instance in dataset.intermediate_representation:
+                for each_instance in instruction_dataset:
                     each_instance["COT"] = str(args.cot)
 
                     if each_instruction not in [
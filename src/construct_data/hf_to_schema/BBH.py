@@ -1,21 +1,49 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import pyarrow as pa
+import pyarrow.compute as pc
 from datasets import load_dataset, concatenate_datasets, Dataset
 from ..constants import create_schema, SCHEMA_KEYS
+from .categories import BBH_TASKS
 import re
 
+# parenthesised option labels, removed from the text of an option
+OPTION_LABEL_PATTERN = re.compile(r"\(.*\)")
+# subtasks downloaded or read from the HF cache at the same time
+BBH_LOADING_THREADS = 8
 
-def regex_match_option_label_text(input: str, candidate_list: list):
-    option_text_mapping = {}
+
+@lru_cache(maxsize=None)
+def get_option_patterns(candidate_list: tuple):
+    """Compile the patterns matching the text of every option of a label set once
+
+    Args:
+        candidate_list (tuple): option labels, e.g. ("(A)", "(B)")
+
+    Returns:
+        list: (option, compiled pattern) pairs
+    """
+    option_patterns = []
     for option in candidate_list:
         target_answer_letter = option.strip().replace("(", "")
         target_answer_letter = target_answer_letter.replace(")", "")
-        string_corresponding_to_option = re.search(
-            rf"\({target_answer_letter}\).*([\n\(]|$)", input
+        option_patterns.append(
+            (option, re.compile(rf"\({target_answer_letter}\).*([\n\(]|$)"))
         )
+    return option_patterns
+
+
+def regex_match_option_label_text(input: str, candidate_list: list):
+    option_text_mapping = {}
+    for option, option_pattern in get_option_patterns(tuple(candidate_list)):
+        string_corresponding_to_option = option_pattern.search(input)
         if not string_corresponding_to_option:
             continue
         string_corresponding_to_option = string_corresponding_to_option.group(0).strip()
-        string_corresponding_to_option = re.sub(
-            r"\(.*\)", "", string_corresponding_to_option
+        string_corresponding_to_option = OPTION_LABEL_PATTERN.sub(
+            "", string_corresponding_to_option
         ).strip()
         option_text_mapping[option] = string_corresponding_to_option
     return option_text_mapping
@@ -175,136 +203,7 @@ class BBH:
         "(Q)",
         "(R)",
     ]
-    BBH_TASKS = {
-        "boolean_expressions": {
-            "candidate_answers": ["True", "False"],
-        },
-        "causal_judgement": {
-            "candidate_answers": ["Yes", "No"],
-        },
-        "date_understanding": {
-            "candidate_answers": ["(A)", "(B)", "(C)", "(D)", "(E)", "(F)"],
-        },
-        "disambiguation_qa": {
-            "candidate_answers": ["(A)", "(B)", "(C)"],
-        },
-        "dyck_languages": {
-            "candidate_answers": [],
-        },
-        "formal_fallacies": {
-            "candidate_answers": ["valid", "invalid"],
-        },
-        "geometric_shapes": {
-            "candidate_answers": [
-                "(A)",
-                "(B)",
-                "(C)",
-                "(D)",
-                "(E)",
-                "(F)",
-                "(G)",
-                "(H)",
-                "(I)",
-                "(J)",
-                "(K)",
-            ],
-        },
-        "hyperbaton": {
-            "candidate_answers": ["(A)", "(B)"],
-        },
-        "logical_deduction_five_objects": {
-            "candidate_answers": ["(A)", "(B)", "(C)", "(D)", "(E)"],
-        },
-        "logical_deduction_seven_objects": {
-            "candidate_answers": [
-                "(A)",
-                "(B)",
-                "(C)",
-                "(D)",
-                "(E)",
-                "(F)",
-                "(G)",
-            ],
-        },
-        "logical_deduction_three_objects": {
-            "candidate_answers": ["(A)", "(B)", "(C)"],
-        },
-        "movie_recommendation": {
-            "candidate_answers": ["(A)", "(B)", "(C)", "(D)", "(E)"],
-        },
-        "multistep_arithmetic_two": {
-            "candidate_answers": [],
-        },
-        "navigate": {
-            "candidate_answers": ["Yes", "No"],
-        },
-        "object_counting": {
-            "candidate_answers": [],
-        },
-        "penguins_in_a_table": {
-            "candidate_answers": ["(A)", "(B)", "(C)", "(D)", "(E)"],
-        },
-        "reasoning_about_colored_objects": {
-            "candidate_answers": [
-                "(A)",
-                "(B)",
-                "(C)",
-                "(D)",
-                "(E)",
-                "(F)",
-                "(G)",
-                "(H)",
-                "(I)",
-                "(J)",
-                "(K)",
-                "(L)",
-                "(M)",
-                "(N)",
-                "(O)",
-                "(P)",
-                "(Q)",
-                "(R)",
-            ],
-        },
-        "ruin_names": {
-            "candidate_answers": ["(A)", "(B)", "(C)", "(D)"],
-        },
-        "salient_translation_error_detection": {
-            "candidate_answers": ["(A)", "(B)", "(C)", "(D)", "(E)", "(F)"],
-        },
-        "snarks": {
-            "candidate_answers": ["(A)", "(B)"],
-        },
-        "sports_understanding": {
-            "candidate_answers": ["yes", "no"],
-        },
-        "temporal_sequences": {
-            "candidate_answers": ["(A)", "(B)", "(C)", "(D)"],
-        },
-        "tracking_shuffled_objects_five_objects": {
-            "candidate_answers": ["(A)", "(B)", "(C)", "(D)", "(E)"],
-        },
-        "tracking_shuffled_objects_seven_objects": {
-            "candidate_answers": [
-                "(A)",
-                "(B)",
-                "(C)",
-                "(D)",
-                "(E)",
-                "(F)",
-                "(G)",
-            ],
-        },
-        "tracking_shuffled_objects_three_objects": {
-            "candidate_answers": ["(A)", "(B)", "(C)"],
-        },
-        "web_of_lies": {
-            "candidate_answers": ["Yes", "No"],
-        },
-        "word_sorting": {
-            "candidate_answers": [],
-        },
-    }
+    BBH_TASKS = BBH_TASKS
 
     def __init__(self):
         super().__init__()
@@ -312,31 +211,51 @@ class BBH:
         self.dataset = {}
         dataset = []
         intermediate_representations = {}
-        for task_name, task_parameters in self.BBH_TASKS.items():
+        # seconds spent loading and transforming every subtask
+        self.subtask_timings = {}
+
+        def load_task(task_name):
+            start = time.perf_counter()
             task_dataset = load_dataset("lukaemon/bbh", task_name, split="test")
-            filtered_dataset = []
-            for test_instance in task_dataset:
+            return task_dataset, time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=BBH_LOADING_THREADS) as executor:
+            loaded_tasks = executor.map(load_task, self.BBH_TASKS)
+            for (task_name, task_parameters), (task_dataset, load_time) in zip(
+                self.BBH_TASKS.items(), loaded_tasks
+            ):
+                start = time.perf_counter()
+                filtered_dataset = task_dataset
                 if task_parameters["candidate_answers"]:
                     # Couple of cases where the input dataset is noisy and no actual labels given
-                    if (
-                        task_parameters["candidate_answers"]
-                        and test_instance["target"].strip()
-                        in task_parameters["candidate_answers"]
-                    ):
-                        filtered_dataset.append(test_instance)
-                else:
-                    filtered_dataset.append(test_instance)
-            filtered_dataset = Dataset.from_list(filtered_dataset)
-            dataset.append(filtered_dataset)
-            intermediate_representations["BBH_" + task_name] = filtered_dataset.map(
-                transform_bbh,
-                fn_kwargs={
-                    "task_parameters": task_parameters,
-                    "task_name": task_name,
-                    "BBH_OPTIONS": self.BBH_OPTIONS,
-                },
-                remove_columns=task_dataset.column_names,
-            )
+                    task_table = task_dataset.with_format("arrow")[:]
+                    is_valid_target = pc.is_in(
+                        pc.utf8_trim_whitespace(task_table.column("target")),
+                        value_set=pa.array(task_parameters["candidate_answers"]),
+                    )
+                    # a new in memory table, rather than an indices mapping that
+                    # every map over the subtask would go through
+                    filtered_dataset = Dataset(task_table.filter(is_valid_target))
+                dataset.append(filtered_dataset)
+                intermediate_representations["BBH_" + task_name] = filtered_dataset.map(
+                    transform_bbh,
+                    fn_kwargs={
+                        "task_parameters": task_parameters,
+                        "task_name": task_name,
+                        "BBH_OPTIONS": self.BBH_OPTIONS,
+                    },
+                    remove_columns=task_dataset.column_names,
+                )
+                self.subtask_timings[task_name] = {
+                    "load": load_time,
+                    "transform": time.perf_counter() - start,
+                }
+                print(
+                    f"BBH {task_name}: "
+                    f"{len(filtered_dataset)}/{len(task_dataset)} instances, "
+                    f"loaded in {load_time:.2f}s, transformed in "
+                    f"{self.subtask_timings[task_name]['transform']:.2f}s"
+                )
 
         self.dataset = concatenate_datasets([dset for dset in dataset])
         self.intermediate_representation = intermediate_representations
@@ -1,5 +1,6 @@
 from datasets import load_dataset
 from ..constants import create_schema, SCHEMA_KEYS
+from .categories import MMLUPRO_CATEGORIES
 import re
 
 
@@ -117,11 +118,30 @@ def transform_mmlupro(test_instance: dict):
     return schema
 
 
+def transform_mmlupro_batch(test_instances: dict):
+    """Convert a batch of instances into the schema defined
+
+    Args:
+        test_instances (dict): batch of instances of the MMLUPro dataset, as
+            lists of values by column
+
+    Returns:
+        dict: the provided instances in the schema defined, as lists of values by key
+    """
+    schemas = [
+        transform_mmlupro(dict(zip(test_instances, values)))
+        for values in zip(*test_instances.values())
+    ]
+    return {key: [schema[key] for schema in schemas] for key in create_schema()}
+
+
 class MMLUPro:
     """
     This Class holds the MMLUPro dataset post transformation into the schema required
     """
 
+    CATEGORIES = MMLUPRO_CATEGORIES
+
     def __init__(self):
         """
         Initialize MMLUPro Instance
@@ -130,18 +150,29 @@ class MMLUPro:
         # load the dataset
         self.dataset = load_dataset("TIGER-Lab/MMLU-Pro", split="test")
 
-        all_categories = list(set(self.dataset["category"]))
+        # rows of every category, in the order of the dataset
+        indices_by_category = {}
+        for index, category in enumerate(self.dataset["category"]):
+            indices_by_category.setdefault(category, []).append(index)
+        unknown_categories = set(indices_by_category) - set(self.CATEGORIES)
+        if unknown_categories:
+            raise ValueError(
+                f"Unknown MMLUPro categories {sorted(unknown_categories)}, add them "
+                "to MMLUPro.CATEGORIES and to its register_loader call"
+            )
+
+        # transform every instance once, then split the categories
+        intermediate_representation = self.dataset.map(
+            transform_mmlupro_batch,
+            batched=True,
+            remove_columns=self.dataset.column_names,
+        )
 
         intermediate_representations = {}
 
-        for each_category in all_categories:
-            task_dataset = load_dataset("TIGER-Lab/MMLU-Pro", split="test")
-            task_dataset = task_dataset.filter(
-                lambda instance: instance["category"] == each_category
-            )
-
-            intermediate_representations["MMLUPro_" + each_category] = task_dataset.map(
-                transform_mmlupro, remove_columns=self.dataset.column_names
+        for each_category, indices in indices_by_category.items():
+            intermediate_representations["MMLUPro_" + each_category] = (
+                intermediate_representation.select(indices)
             )
 
         self.intermediate_representation = intermediate_representations
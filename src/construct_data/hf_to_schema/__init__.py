@@ -1,9 +1,95 @@
-from .ARCC import ARCC
-from .ARCE import ARCE
-from .BBH import BBH
-from .BoolQ import BoolQ
-from .Hellaswag import Hellaswag
-from .MathQA import MathQA
-from .MMLUPro import MMLUPro
-from .Piqa import Piqa
-from .Winogrande import Winogrande
\ No newline at end of file
+import importlib
+
+from .categories import BBH_TASKS, MMLUPRO_CATEGORIES
+
+# loader name to its metadata, filled by register_loader. The loader modules
+# import datasets, they are only imported by get_loader
+LOADER_REGISTRY = {}
+
+
+def register_loader(
+    name: str, source: str, splits: list, categories: list = None
+) -> None:
+    """Register the loader class of a dataset, without importing it
+
+    Args:
+        name (str): name of the class and of its module in this package, which
+            is the dataset name in the config of create_benchmark
+        source (str): HF dataset the loader converts
+        splits (list): splits of the HF dataset that are loaded
+        categories (list, optional): categories of a loader whose
+            intermediate_representation is a dictionary of datasets, named
+            <name>_<category> in the config. Defaults to None.
+    """
+    LOADER_REGISTRY[name] = {
+        "name": name,
+        "source": source,
+        "splits": list(splits),
+        "categories": list(categories) if categories else [],
+    }
+
+
+def get_loader_info(name: str) -> dict:
+    """Metadata of a registered loader
+
+    Args:
+        name (str): loader name
+
+    Returns:
+        dict: name, source, splits and categories of the loader
+    """
+    if name not in LOADER_REGISTRY:
+        raise ValueError(
+            f"Unknown dataset {name}, available datasets: {sorted(LOADER_REGISTRY)}"
+        )
+    return LOADER_REGISTRY[name]
+
+
+def get_loader(name: str):
+    """Import the module of a registered loader and return its class
+
+    Args:
+        name (str): loader name
+
+    Returns:
+        type: loader class, whose instances have an intermediate_representation
+    """
+    get_loader_info(name)
+    module = importlib.import_module(f".{name}", __name__)
+    loader_class = getattr(module, name)
+    # importing the submodule bound its name in this package, bind the class
+    # instead as the eager imports used to
+    globals()[name] = loader_class
+    return loader_class
+
+
+register_loader("ARCC", "allenai/ai2_arc", ["test"])
+register_loader("ARCE", "allenai/ai2_arc", ["test"])
+register_loader("BBH", "lukaemon/bbh", ["test"], categories=list(BBH_TASKS))
+register_loader("BoolQ", "google/boolq", ["validation"])
+register_loader("Hellaswag", "Rowan/hellaswag", ["validation"])
+register_loader("MathQA", "allenai/math_qa", ["test"])
+register_loader(
+    "MMLUPro", "TIGER-Lab/MMLU-Pro", ["test"], categories=MMLUPRO_CATEGORIES
+)
+register_loader("Piqa", "ybisk/piqa", ["validation"])
+register_loader("Winogrande", "allenai/winogrande", ["validation"])
+
+__all__ = [
+    "LOADER_REGISTRY",
+    "register_loader",
+    "get_loader_info",
+    "get_loader",
+] + list(LOADER_REGISTRY)
+
+
+def __getattr__(name: str):
+    # loader classes are imported on first access, e.g. by
+    # from construct_data.hf_to_schema import BoolQ
+    if name in LOADER_REGISTRY:
+        return get_loader(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(LOADER_REGISTRY))
@@ -0,0 +1,153 @@
+# categories of the loaders whose intermediate_representation is a dictionary
+# of datasets. This module has no dependencies, so that the loader registry
+# lists them without importing the loaders and datasets
+
+# subtasks of BBH, each one is the BBH_<task> dataset, with their answer options
+BBH_TASKS = {
+    "boolean_expressions": {
+        "candidate_answers": ["True", "False"],
+    },
+    "causal_judgement": {
+        "candidate_answers": ["Yes", "No"],
+    },
+    "date_understanding": {
+        "candidate_answers": ["(A)", "(B)", "(C)", "(D)", "(E)", "(F)"],
+    },
+    "disambiguation_qa": {
+        "candidate_answers": ["(A)", "(B)", "(C)"],
+    },
+    "dyck_languages": {
+        "candidate_answers": [],
+    },
+    "formal_fallacies": {
+        "candidate_answers": ["valid", "invalid"],
+    },
+    "geometric_shapes": {
+        "candidate_answers": [
+            "(A)",
+            "(B)",
+            "(C)",
+            "(D)",
+            "(E)",
+            "(F)",
+            "(G)",
+            "(H)",
+            "(I)",
+            "(J)",
+            "(K)",
+        ],
+    },
+    "hyperbaton": {
+        "candidate_answers": ["(A)", "(B)"],
+    },
+    "logical_deduction_five_objects": {
+        "candidate_answers": ["(A)", "(B)", "(C)", "(D)", "(E)"],
+    },
+    "logical_deduction_seven_objects": {
+        "candidate_answers": [
+            "(A)",
+            "(B)",
+            "(C)",
+            "(D)",
+            "(E)",
+            "(F)",
+            "(G)",
+        ],
+    },
+    "logical_deduction_three_objects": {
+        "candidate_answers": ["(A)", "(B)", "(C)"],
+    },
+    "movie_recommendation": {
+        "candidate_answers": ["(A)", "(B)", "(C)", "(D)", "(E)"],
+    },
+    "multistep_arithmetic_two": {
+        "candidate_answers": [],
+    },
+    "navigate": {
+        "candidate_answers": ["Yes", "No"],
+    },
+    "object_counting": {
+        "candidate_answers": [],
+    },
+    "penguins_in_a_table": {
+        "candidate_answers": ["(A)", "(B)", "(C)", "(D)", "(E)"],
+    },
+    "reasoning_about_colored_objects": {
+        "candidate_answers": [
+            "(A)",
+            "(B)",
+            "(C)",
+            "(D)",
+            "(E)",
+            "(F)",
+            "(G)",
+            "(H)",
+            "(I)",
+            "(J)",
+            "(K)",
+            "(L)",
+            "(M)",
+            "(N)",
+            "(O)",
+            "(P)",
+            "(Q)",
+            "(R)",
+        ],
+    },
+    "ruin_names": {
+        "candidate_answers": ["(A)", "(B)", "(C)", "(D)"],
+    },
+    "salient_translation_error_detection": {
+        "candidate_answers": ["(A)", "(B)", "(C)", "(D)", "(E)", "(F)"],
+    },
+    "snarks": {
+        "candidate_answers": ["(A)", "(B)"],
+    },
+    "sports_understanding": {
+        "candidate_answers": ["yes", "no"],
+    },
+    "temporal_sequences": {
+        "candidate_answers": ["(A)", "(B)", "(C)", "(D)"],
+    },
+    "tracking_shuffled_objects_five_objects": {
+        "candidate_answers": ["(A)", "(B)", "(C)", "(D)", "(E)"],
+    },
+    "tracking_shuffled_objects_seven_objects": {
+        "candidate_answers": [
+            "(A)",
+            "(B)",
+            "(C)",
+            "(D)",
+            "(E)",
+            "(F)",
+            "(G)",
+        ],
+    },
+    "tracking_shuffled_objects_three_objects": {
+        "candidate_answers": ["(A)", "(B)", "(C)"],
+    },
+    "web_of_lies": {
+        "candidate_answers": ["Yes", "No"],
+    },
+    "word_sorting": {
+        "candidate_answers": [],
+    },
+}
+
+# categories of MMLU-Pro, each one is the MMLUPro_<category> dataset
+MMLUPRO_CATEGORIES = [
+    "biology",
+    "business",
+    "chemistry",
+    "computer science",
+    "economics",
+    "engineering",
+    "health",
+    "history",
+    "law",
+    "math",
+    "other",
+    "philosophy",
+    "physics",
+    "psychology",
+]
@@ -0,0 +1,164 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+
+# bump to invalidate every cached intermediate representation
+IR_CACHE_VERSION = "1"
+DEFAULT_IR_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "kcif", "intermediate_representation"
+)
+MANIFEST_FILE_NAME = "manifest.json"
+# the schema helpers shared by every loader, and the categories of the loaders
+# of dictionaries of datasets
+CONSTANTS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "constants.py"
+)
+CATEGORIES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "hf_to_schema", "categories.py"
+)
+
+
+def get_ir_cache_key(loader_class) -> str:
+    """Hash of the code that builds an intermediate representation: the loader
+    module, construct_data/constants.py, hf_to_schema/categories.py, the datasets
+    version and IR_CACHE_VERSION
+
+    Args:
+        loader_class (type): loader class
+
+    Returns:
+        str: cache key of the loader
+    """
+    import datasets
+
+    digest = hashlib.sha256()
+    digest.update(IR_CACHE_VERSION.encode("utf8"))
+    digest.update(datasets.__version__.encode("utf8"))
+    for source_path in [
+        inspect.getsourcefile(loader_class),
+        CONSTANTS_PATH,
+        CATEGORIES_PATH,
+    ]:
+        with open(source_path, "rb") as reader:
+            digest.update(reader.read())
+    return digest.hexdigest()[:16]
+
+
+def save_intermediate_representation(intermediate_representation, path: str) -> None:
+    """Save an intermediate representation as Arrow files. The folder is written
+    next to path and moved in place once complete, so a run interrupted while
+    saving leaves no partial cache entry
+
+    Args:
+        intermediate_representation (Dataset | dict): dataset, or dictionary of
+            datasets by category as for MMLUPro and BBH
+        path (str): folder of the cache entry
+    """
+    # per process, so that builds sharing the cache folder do not clobber it
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(temp_path):
+        shutil.rmtree(temp_path)
+    os.makedirs(temp_path)
+
+    if isinstance(intermediate_representation, dict):
+        # categories are not valid folder names, e.g. MMLUPro's have spaces
+        entries = {
+            category: f"{index:04d}"
+            for index, category in enumerate(intermediate_representation)
+        }
+        datasets_by_folder = {
+            folder: intermediate_representation[category]
+            for category, folder in entries.items()
+        }
+    else:
+        entries = None
+        datasets_by_folder = {"dataset": intermediate_representation}
+
+    for folder, dataset in datasets_by_folder.items():
+        dataset.save_to_disk(os.path.join(temp_path, folder))
+    manifest = {
+        "version": IR_CACHE_VERSION,
+        "entries": entries,
+        "fingerprints": {
+            folder: dataset._fingerprint
+            for folder, dataset in datasets_by_folder.items()
+        },
+    }
+    with open(
+        os.path.join(temp_path, MANIFEST_FILE_NAME), "w", encoding="utf8"
+    ) as writer:
+        json.dump(manifest, writer, indent=1)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(temp_path, path)
+
+
+def load_intermediate_representation(path: str):
+    """Load a cached intermediate representation, its Arrow files are memory mapped
+
+    Args:
+        path (str): folder of the cache entry
+
+    Returns:
+        Dataset | dict: intermediate representation, None when not cached
+    """
+    from datasets import load_from_disk
+
+    manifest_path = os.path.join(path, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf8") as reader:
+        manifest = json.load(reader)
+    if manifest["entries"] is None:
+        return load_from_disk(os.path.join(path, "dataset"))
+    return {
+        category: load_from_disk(os.path.join(path, folder))
+        for category, folder in manifest["entries"].items()
+    }
+
+
+def get_intermediate_representation(
+    dataset_name: str, cache_dir: str = None, refresh: bool = False
+):
+    """Intermediate representation of a dataset, built by its loader class or
+    read from the cache. Entries are stored in <cache_dir>/<dataset_name>/<key>,
+    with the key of get_ir_cache_key, so editing a loader or the schema rebuilds
+    it. Entries of other keys are never deleted. The key cannot cover the source
+    dataset without loading it, use refresh when the dataset changes on the Hub
+
+    Args:
+        dataset_name (str): name of the dataset, e.g. BoolQ
+        cache_dir (str, optional): cache folder. Defaults to None, no caching.
+        refresh (bool, optional): rebuild and overwrite the cache entry.
+            Defaults to False.
+
+    Returns:
+        Dataset | dict: intermediate representation
+    """
+    # the package is importable once create_benchmark has extended sys.path
+    from construct_data.hf_to_schema import get_loader
+
+    loader_class = get_loader(dataset_name)
+    if cache_dir is None:
+        return loader_class().intermediate_representation
+
+    dataset_cache_dir = os.path.join(cache_dir, dataset_name)
+    key = get_ir_cache_key(loader_class)
+    path = os.path.join(dataset_cache_dir, key)
+    if not refresh:
+        intermediate_representation = load_intermediate_representation(path)
+        if intermediate_representation is not None:
+            print(
+                f"Loaded the intermediate representation of {dataset_name} from {path}"
+            )
+            return intermediate_representation
+
+    intermediate_representation = loader_class().intermediate_representation
+    # the entries of other keys are left in place, they may belong to another
+    # checkout sharing the cache folder or be memory mapped by a running build
+    save_intermediate_representation(intermediate_representation, path)
+    # read back, so that cold and warm runs both work on memory mapped files
+    return load_intermediate_representation(path)
@@ -0,0 +1,384 @@
+import json
+import os
+import shutil
+from glob import glob
+from typing import Iterable, Iterator
+from urllib.parse import quote
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from inference import jsonl_io
+
+# file extension of the part files of each columnar format
+COLUMNAR_FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+# position of every result in all_results.jsonl, to read them back in order
+RESULT_INDEX_COLUMN = "result_index"
+# schema metadata listing the columns stored as JSON text, and the typed
+# columns whose nulls are keys missing from the record rather than None values
+JSON_COLUMNS_KEY = b"json_columns"
+OPTIONAL_COLUMNS_KEY = b"optional_columns"
+# pyarrow.dataset format of each columnar format
+DATASET_FORMATS = {"parquet": "parquet", "arrow": "ipc"}
+PARTITION_COLUMNS = ("dataset", "instruction_id")
+# same name as the null partition of pyarrow's hive partitioning
+DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+# rows per part file, and rows buffered across partitions before flushing the largest
+PART_SIZE = 10000
+MAX_BUFFERED_ROWS = 100000
+# value of the keys missing from a record in a JSON or optional column
+MISSING = object()
+# range of the integers stored in an int64 column
+INT64_RANGE = (-(2**63), 2**63 - 1)
+
+
+def get_columnar_results_path(output_folder: str, file_format: str) -> str:
+    """Path to the columnar results store of an output folder
+
+    Args:
+        output_folder (str): output folder of the run
+        file_format (str): one of COLUMNAR_FORMATS
+
+    Returns:
+        str: path to the all_results.<format> folder
+    """
+    return os.path.join(output_folder, f"all_results.{file_format}")
+
+
+def update_column_stats(column_stats: dict, record: dict) -> None:
+    """Update the value types seen in every column with the values of a record
+
+    Args:
+        column_stats (dict): stats by column, updated in place
+        record (dict): result
+    """
+    for key, value in record.items():
+        stats = column_stats.get(key)
+        if stats is None:
+            stats = column_stats[key] = {
+                "types": set(),
+                "count": 0,
+                "has_none": False,
+                "list_of_str": True,
+                "int64": True,
+            }
+        stats["count"] += 1
+        if value is None:
+            stats["has_none"] = True
+            continue
+        value_type = type(value)
+        stats["types"].add(value_type)
+        if value_type is list:
+            if stats["list_of_str"] and not all(type(item) is str for item in value):
+                stats["list_of_str"] = False
+        elif value_type is int:
+            if not INT64_RANGE[0] <= value <= INT64_RANGE[1]:
+                stats["int64"] = False
+
+
+def get_column_type(stats: dict):
+    """Arrow type of a column when all its values round-trip exactly through it
+
+    Args:
+        stats (dict): stats of the column, see update_column_stats
+
+    Returns:
+        pa.DataType: string, int64, bool, list of strings or null type, None
+            when the values have mixed or other types
+    """
+    value_types = stats["types"]
+    if not value_types:
+        return pa.null()
+    if value_types == {str}:
+        return pa.string()
+    if value_types == {int} and stats["int64"]:
+        return pa.int64()
+    if value_types == {bool}:
+        return pa.bool_()
+    if value_types == {list} and stats["list_of_str"]:
+        return pa.list_(pa.string())
+    return None
+
+
+def infer_results_schema(results_path: str):
+    """Schema shared by every part file of a store, from a pass over all the
+    results. A column is typed when get_column_type finds a type for all its
+    values. Its nulls are None values, or keys missing from some records for
+    the optional columns. Any other column is stored as JSON text, null where
+    the key is missing, so every record reads back exactly as it was written,
+    e.g. Hellaswag's list labels
+
+    Args:
+        results_path (str): path to all_results.jsonl
+
+    Returns:
+        tuple: pa.Schema of the store and number of results
+    """
+    column_stats = {}
+    num_results = 0
+    for record in jsonl_io.iter_jsonl(results_path):
+        update_column_stats(column_stats, record)
+        num_results += 1
+
+    fields = [pa.field(RESULT_INDEX_COLUMN, pa.int64(), nullable=False)]
+    json_columns = []
+    optional_columns = []
+    for key, stats in column_stats.items():
+        column_type = get_column_type(stats)
+        is_optional = stats["count"] < num_results
+        if column_type is None or (is_optional and stats["has_none"]):
+            column_type = pa.string()
+            json_columns.append(key)
+        elif is_optional:
+            optional_columns.append(key)
+        fields.append(pa.field(key, column_type))
+    metadata = {
+        JSON_COLUMNS_KEY: json.dumps(json_columns),
+        OPTIONAL_COLUMNS_KEY: json.dumps(optional_columns),
+    }
+    return pa.schema(fields, metadata=metadata), num_results
+
+
+def records_to_table(records: list, result_indices: list, schema):
+    """Build the table of a part file
+
+    Args:
+        records (list): results
+        result_indices (list): position of each result in all_results.jsonl
+        schema (pa.Schema): schema of the store, see infer_results_schema
+
+    Returns:
+        pa.Table: table of the records
+    """
+    json_columns = set(json.loads(schema.metadata[JSON_COLUMNS_KEY]))
+    arrays = [pa.array(result_indices, type=pa.int64())]
+    for field in list(schema)[1:]:
+        if field.name in json_columns:
+            values = [
+                (
+                    jsonl_io.dumps(record[field.name]).decode("utf8")
+                    if field.name in record
+                    else None
+                )
+                for record in records
+            ]
+        else:
+            values = [record.get(field.name) for record in records]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def get_partition_folder(record: dict) -> str:
+    """Hive style dataset=<dataset>/instruction_id=<instruction_id> folder
+
+    Args:
+        record (dict): result
+
+    Returns:
+        str: relative folder of the record's partition
+    """
+    parts = []
+    for column in PARTITION_COLUMNS:
+        value = record.get(column)
+        if not isinstance(value, str) or value == "":
+            value = DEFAULT_PARTITION
+        parts.append(f"{column}={quote(value, safe='')}")
+    return os.path.join(*parts)
+
+
+def write_table(table, file_path: str, file_format: str) -> None:
+    """Write a part file
+
+    Args:
+        table (pa.Table): table to write
+        file_path (str): path to the part file
+        file_format (str): one of COLUMNAR_FORMATS
+    """
+    if file_format == "parquet":
+        pq.write_table(table, file_path, compression="zstd")
+    else:
+        # uncompressed, so that reading needs no decompression
+        with pa.OSFile(file_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+
+def write_columnar_results(
+    results_path: str, output_path: str, file_format: str = "parquet"
+) -> int:
+    """Convert all_results.jsonl to a columnar store partitioned by dataset and
+    instruction, with part files of at most PART_SIZE results that all have the
+    schema of infer_results_schema. Results are streamed in two passes, the
+    first one for the schema, and at most MAX_BUFFERED_ROWS of them are held
+    in memory
+
+    Args:
+        results_path (str): path to all_results.jsonl
+        output_path (str): folder of the columnar store, replaced if it exists
+        file_format (str, optional): one of COLUMNAR_FORMATS. Defaults to "parquet".
+
+    Returns:
+        int: number of results written
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required to write columnar results")
+    extension = COLUMNAR_FORMATS[file_format]
+    schema, _ = infer_results_schema(results_path)
+    temp_path = output_path + ".tmp"
+    if os.path.exists(temp_path):
+        shutil.rmtree(temp_path)
+
+    buffers = {}
+    num_parts = {}
+    num_buffered = 0
+
+    def flush(partition_folder):
+        records, result_indices = buffers.pop(partition_folder)
+        folder = os.path.join(temp_path, partition_folder)
+        os.makedirs(folder, exist_ok=True)
+        part_id = num_parts.get(partition_folder, 0)
+        num_parts[partition_folder] = part_id + 1
+        write_table(
+            records_to_table(records, result_indices, schema),
+            os.path.join(folder, f"part-{part_id:05d}.{extension}"),
+            file_format,
+        )
+        return len(records)
+
+    num_results = 0
+    for result_index, record in enumerate(jsonl_io.iter_jsonl(results_path)):
+        partition_folder = get_partition_folder(record)
+        records, result_indices = buffers.setdefault(partition_folder, ([], []))
+        records.append(record)
+        result_indices.append(result_index)
+        num_buffered += 1
+        num_results += 1
+        if len(records) >= PART_SIZE:
+            num_buffered -= flush(partition_folder)
+        elif num_buffered >= MAX_BUFFERED_ROWS:
+            largest = max(buffers, key=lambda folder: len(buffers[folder][0]))
+            num_buffered -= flush(largest)
+    for partition_folder in list(buffers):
+        flush(partition_folder)
+
+    os.makedirs(temp_path, exist_ok=True)
+    if os.path.exists(output_path):
+        shutil.rmtree(output_path)
+    os.replace(temp_path, output_path)
+    return num_results
+
+
+def get_store_format(store_path: str) -> str:
+    """Format of the part files of a columnar store
+
+    Args:
+        store_path (str): folder of the columnar store
+
+    Returns:
+        str: one of COLUMNAR_FORMATS, None for a store without results
+    """
+    for file_format, extension in COLUMNAR_FORMATS.items():
+        if glob(os.path.join(store_path, "**", f"*.{extension}"), recursive=True):
+            return file_format
+    return None
+
+
+def read_columnar_results(store_path: str, fields: Iterable = None):
+    """Read the columns of a columnar store as a single Arrow table, in the
+    order of all_results.jsonl. Only the columns of fields are read
+
+    Args:
+        store_path (str): folder of the columnar store
+        fields (Iterable, optional): columns to read besides RESULT_INDEX_COLUMN,
+            those missing from the store are skipped. Defaults to None, all.
+
+    Returns:
+        pa.Table: columns of the store, None for a store without results
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required to read columnar results")
+    file_format = get_store_format(store_path)
+    if file_format is None:
+        return None
+    # the partition values are also stored as columns of the part files, and
+    # Arrow IPC files are memory mapped
+    dataset = ds.dataset(
+        store_path,
+        format=DATASET_FORMATS[file_format],
+        filesystem=pafs.LocalFileSystem(use_mmap=file_format == "arrow"),
+    )
+    columns = None
+    if fields is not None:
+        columns = [RESULT_INDEX_COLUMN] + [
+            field for field in fields if field in dataset.schema.names
+        ]
+    table = dataset.to_table(columns=columns).sort_by(RESULT_INDEX_COLUMN)
+    return table.replace_schema_metadata(dataset.schema.metadata)
+
+
+def iter_columnar_results(store_path: str, fields: Iterable = None) -> Iterator[dict]:
+    """Read back the results of a columnar store, in the order of all_results.jsonl.
+    Only the columns of fields are read, and they are converted to records
+    PART_SIZE rows at a time
+
+    Args:
+        store_path (str): folder of the columnar store
+        fields (Iterable, optional): keep only these keys of every record,
+            only their columns are read. Defaults to None, keeping every key.
+
+    Yields:
+        dict: results, with their keys in the order of fields when given
+    """
+    if fields is not None:
+        fields = tuple(fields)
+    table = read_columnar_results(store_path, fields)
+    if table is None:
+        return
+    schema_metadata = table.schema.metadata or {}
+    json_columns = set(json.loads(schema_metadata.get(JSON_COLUMNS_KEY, b"[]")))
+    optional_columns = set(json.loads(schema_metadata.get(OPTIONAL_COLUMNS_KEY, b"[]")))
+    names = [name for name in table.column_names if name != RESULT_INDEX_COLUMN]
+    if fields is not None:
+        names.sort(key=fields.index)
+    for batch in table.to_batches(max_chunksize=PART_SIZE):
+        columns = []
+        for name in names:
+            values = batch.column(name).to_pylist()
+            if name in json_columns:
+                values = [
+                    MISSING if value is None else jsonl_io.loads(value)
+                    for value in values
+                ]
+            elif name in optional_columns:
+                values = [MISSING if value is None else value for value in values]
+            columns.append(values)
+        rows = zip(*columns) if columns else [()] * batch.num_rows
+        for row in rows:
+            yield {
+                name: value for name, value in zip(names, row) if value is not MISSING
+            }
+
+
+def write_jsonl_results(store_path: str, results_path: str) -> int:
+    """Write the results of a columnar store back to all_results.jsonl
+
+    Args:
+        store_path (str): folder of the columnar store
+        results_path (str): path to all_results.jsonl, replaced if it exists
+
+    Returns:
+        int: number of results written
+    """
+    temp_path = results_path + ".tmp"
+    num_results = 0
+    with open(temp_path, "wb") as writer:
+        for record in iter_columnar_results(store_path):
+            writer.write(jsonl_io.dumps(record) + b"\n")
+            num_results += 1
+    os.replace(temp_path, results_path)
+    return num_results
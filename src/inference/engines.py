@@ -0,0 +1,647 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from itertools import islice
+
+from tqdm import tqdm
+
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
+
+logger = logging.getLogger(name="KCIF")
+
+# tokens per KV cache block, vllm's default block size
+PREFIX_CACHE_BLOCK_SIZE = 16
+
+# engine name to Engine subclass, filled by register_engine
+ENGINE_REGISTRY = {}
+
+
+def register_engine(name: str):
+    """Class decorator registering an Engine subclass under the given name,
+    which is the value to pass to --engine
+
+    Args:
+        name (str): engine name
+    """
+
+    def decorator(engine_class):
+        engine_class.name = name
+        ENGINE_REGISTRY[name] = engine_class
+        return engine_class
+
+    return decorator
+
+
+def get_engine(name: str, args):
+    """Create the engine registered under the given name
+
+    Args:
+        name (str): engine name
+        args (Namespace): command-line arguments
+
+    Returns:
+        Engine: engine instance, not loaded yet
+    """
+    if name not in ENGINE_REGISTRY:
+        raise ValueError(
+            f"Unknown engine {name}, available engines: {sorted(ENGINE_REGISTRY)}"
+        )
+    return ENGINE_REGISTRY[name](args)
+
+
+def render_prompts(user_messages: list, tokenizer) -> list:
+    """Applies the chat template to a list of user messages, in a single
+    batched call
+
+    Args:
+        user_messages (list): user messages
+        tokenizer (_type_): tokenizer
+
+    Returns:
+        list: user messages after applying chat template
+    """
+    if not tokenizer.chat_template or not user_messages:
+        return list(user_messages)
+    chats = [[{"role": "user", "content": message}] for message in user_messages]
+    return tokenizer.apply_chat_template(
+        chats,
+        add_generation_prompt=True,
+        tokenize=False,
+    )
+
+
+def create_length_bucketed_batches(
+    prompt_lengths: list,
+    batch_size: int,
+    max_batch_tokens: int = None,
+    max_output_length: int = 0,
+) -> list:
+    """Group prompts of similar length into batches to minimize padding.
+    Prompts are sorted by length and batches are filled greedily, either up
+    to batch_size prompts or, if max_batch_tokens is given, for as long as
+    the padded batch plus its generated tokens fits in the token budget
+
+    Args:
+        prompt_lengths (list): number of tokens of each prompt
+        batch_size (int): number of prompts per batch, used without a token budget
+        max_batch_tokens (int, optional): token budget of a batch. Defaults to None.
+        max_output_length (int, optional): tokens generated per prompt. Defaults to 0.
+
+    Returns:
+        list: batches as lists of prompt indices, longest prompts first
+    """
+    sorted_indices = sorted(
+        range(len(prompt_lengths)), key=lambda index: prompt_lengths[index]
+    )
+
+    batches = []
+    batch = []
+    for index in sorted_indices:
+        if batch:
+            if max_batch_tokens is None:
+                batch_is_full = len(batch) >= batch_size
+            else:
+                # prompts are sorted, so the current prompt is the longest
+                padded_length = prompt_lengths[index] + max_output_length
+                batch_is_full = (len(batch) + 1) * padded_length > max_batch_tokens
+            if batch_is_full:
+                batches.append(batch)
+                batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+
+    # an out of memory error shows up on the first batch rather than the last
+    batches.reverse()
+    return batches
+
+
+def estimate_prefix_cache_hit_rate(
+    prompts_token_ids: list, block_size: int = PREFIX_CACHE_BLOCK_SIZE
+) -> float:
+    """Estimate the share of prompt tokens served from an automatic prefix
+    cache when the prompts are submitted in the given order. Like vllm, full
+    blocks of tokens are hashed along with their prefix, and a block is a hit
+    if the same block with the same prefix was seen before. The cache is
+    assumed to be large enough to never evict a block
+
+    Args:
+        prompts_token_ids (list): token ids of every prompt in submission order
+        block_size (int, optional): tokens per KV cache block.
+            Defaults to PREFIX_CACHE_BLOCK_SIZE.
+
+    Returns:
+        float: cached prompt tokens over all prompt tokens
+    """
+    cached_blocks = set()
+    num_cached_tokens = 0
+    num_tokens = 0
+    for token_ids in prompts_token_ids:
+        num_tokens += len(token_ids)
+        block_hash = None
+        for start in range(0, len(token_ids) - block_size + 1, block_size):
+            block_hash = hash(
+                (block_hash, tuple(token_ids[start : start + block_size]))
+            )
+            if block_hash in cached_blocks:
+                num_cached_tokens += block_size
+            else:
+                cached_blocks.add(block_hash)
+    return num_cached_tokens / num_tokens if num_tokens > 0 else 0.0
+
+
+def report_vllm_prefix_cache_hit_rate(llm) -> None:
+    """Log the prefix cache hit rate measured by vllm, for the vllm versions
+    that expose their metrics through LLM.get_metrics
+
+    Args:
+        llm (LLM): vllm engine
+    """
+    if not hasattr(llm, "get_metrics"):
+        return
+    counters = {}
+    for metric in llm.get_metrics():
+        if metric.name in ["vllm:prefix_cache_queries", "vllm:prefix_cache_hits"]:
+            counters[metric.name] = getattr(metric, "value", 0)
+    if counters.get("vllm:prefix_cache_queries", 0) > 0:
+        hit_rate = (
+            counters.get("vllm:prefix_cache_hits", 0)
+            / counters["vllm:prefix_cache_queries"]
+        )
+        logger.warning(f"Prefix cache hit rate reported by vllm: {hit_rate:.2%}")
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and connection errors are retried
+
+    Args:
+        error (Exception): error raised by the request
+
+    Returns:
+        bool: True if the request should be retried
+    """
+    if isinstance(error, (APITimeoutError, APIConnectionError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+async def generate_online(
+    client: AsyncOpenAI, semaphore: asyncio.Semaphore, instance: dict, args
+) -> dict:
+    """Query the OpenAI compatible server for one instance, retrying with
+    jittered exponential backoff
+
+    Args:
+        client (AsyncOpenAI): client for the OpenAI compatible server
+        semaphore (asyncio.Semaphore): bounds the number of in-flight requests
+        instance (dict): instance to generate the output for
+        args (Namespace): command-line arguments
+
+    Returns:
+        dict: instance with "prompt" and "output"
+    """
+    messages = [{"role": "user", "content": instance["input"]}]
+    for attempt in range(args.max_retries + 1):
+        try:
+            async with semaphore:
+                chat_completion = await client.chat.completions.create(
+                    messages=messages,
+                    model=args.model_name,
+                    max_tokens=args.max_output_length,
+                    temperature=0.0,
+                    timeout=args.request_timeout,
+                )
+            break
+        except Exception as error:
+            if attempt == args.max_retries or not is_retryable_error(error):
+                raise
+            # full jitter, the semaphore is released while sleeping
+            await asyncio.sleep(random.uniform(0, min(60.0, 2.0**attempt)))
+
+    instance["prompt"] = instance["input"]
+    instance["output"] = chat_completion.choices[0].message.content or ""
+    return instance
+
+
+class Engine:
+    """
+    Base class of the inference backends. An engine is loaded once, then
+    generates the outputs of the pending instances of every input file, batch
+    by batch, and is closed at the end of the run.
+
+    Subclasses either implement generate_batch(instances), which returns the
+    instances of a batch with their "output" set and is called by run, or
+    override run to take over the whole loop. They may override schedule to
+    choose the batches.
+    """
+
+    name = None
+    # write a file's results once the whole file is done, in their original order
+    write_in_file_order = False
+
+    def __init__(self, args):
+        """
+        Initialize the engine
+
+        Args:
+            args (Namespace): command-line arguments
+        """
+        self.args = args
+        self.tokenizer_name = (
+            args.model_name if args.tokenizer_name == "auto" else args.tokenizer_name
+        )
+
+    def load(self) -> None:
+        """Load the model"""
+
+    def schedule(self, instances: list) -> list:
+        """Split the pending instances of a file into batches
+
+        Args:
+            instances (list): pending instances of a file
+
+        Returns:
+            list: batches of instances
+        """
+        batch_size = self.args.batch_size
+        return [
+            instances[start : start + batch_size]
+            for start in range(0, len(instances), batch_size)
+        ]
+
+    def run(self, pending_files, result_writer) -> None:
+        """Generate the outputs of every pending instance and write them
+
+        Args:
+            pending_files (Iterable): (file name, pending instances) pairs
+            result_writer (ResultWriter): writer for the results
+        """
+        for file_name, instances in pending_files:
+            for batch in tqdm(
+                self.schedule(instances),
+                desc=f"For each batch in dataset {file_name}",
+            ):
+                results = self.generate_batch(batch)
+                if not self.write_in_file_order:
+                    result_writer.write(file_name, results)
+            if self.write_in_file_order:
+                result_writer.write(file_name, instances)
+
+    def close(self) -> None:
+        """Release the resources held by the engine"""
+
+
+@register_engine("vllm")
+class VLLMEngine(Engine):
+    """
+    Offline inference with vllm, either batch by batch or, with
+    --continuous_batching, with the prompts of a window of files in one
+    generate call
+    """
+
+    def load(self) -> None:
+        import torch
+        from transformers import AutoTokenizer
+        from vllm import LLM, SamplingParams
+
+        self.sampling_params = SamplingParams(
+            temperature=0.0, max_tokens=self.args.max_output_length, n=1
+        )
+        llm_kwargs = {}
+        if self.args.prefix_cache_ordering:
+            # only forced on, the engine's default is kept otherwise
+            llm_kwargs["enable_prefix_caching"] = True
+        self.llm = LLM(
+            model=self.args.model_name,
+            tokenizer=self.tokenizer_name,
+            tensor_parallel_size=self.args.tensor_parallel_size,
+            dtype=torch.bfloat16,
+            gpu_memory_utilization=0.9,
+            trust_remote_code=True,
+            **llm_kwargs,
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(
+            self.tokenizer_name, trust_remote_code=True
+        )
+
+    def generate_batch(
+        self, instances: list, use_tqdm: bool = False, input_prompts: list = None
+    ) -> list:
+        if input_prompts is None:
+            input_prompts = render_prompts(
+                [instance["input"] for instance in instances],
+                self.tokenizer,
+            )
+        outputs = self.llm.generate(
+            input_prompts, sampling_params=self.sampling_params, use_tqdm=use_tqdm
+        )
+        # vllm returns the outputs in the order the prompts were submitted
+        for instance, input_prompt, output in zip(instances, input_prompts, outputs):
+            instance["output"] = output.outputs[0].text
+            instance["prompt"] = input_prompt
+        return instances
+
+    def run(self, pending_files, result_writer) -> None:
+        if not (self.args.continuous_batching or self.args.prefix_cache_ordering):
+            return super().run(pending_files, result_writer)
+
+        # submit the pending instances of --continuous_batching_files files at a
+        # time in a single generate call, leaving the batch size to vllm's
+        # continuous batching. The window bounds the instances held in memory
+        # and the results lost to a crash, which are written once it completes
+        pending_files = iter(pending_files)
+        window_size = self.args.continuous_batching_files
+        while True:
+            window = list(islice(pending_files, window_size or None))
+            if not window:
+                break
+            self.generate_window(window)
+            for file_name, file_instances in window:
+                result_writer.write(file_name, file_instances)
+
+        if self.args.prefix_cache_ordering:
+            report_vllm_prefix_cache_hit_rate(self.llm)
+
+    def generate_window(self, window: list) -> None:
+        """Generate the outputs of the pending instances of a window of files
+        in a single generate call
+
+        Args:
+            window (list): (file name, pending instances) pairs
+        """
+        instances = [
+            instance for _, file_instances in window for instance in file_instances
+        ]
+        input_prompts = None
+        prompts_token_ids = None
+        if self.args.prefix_cache_ordering:
+            # the prefix cache reuses blocks of tokens, so prompts are sorted on
+            # their token ids: prompts sharing a tokenized prefix run together
+            # even where the text order differs, e.g. after the template's header
+            input_prompts = render_prompts(
+                [instance["input"] for instance in instances],
+                self.tokenizer,
+            )
+            input_ids = self.tokenizer(input_prompts, add_special_tokens=False)[
+                "input_ids"
+            ]
+            order = sorted(range(len(instances)), key=lambda idx: input_ids[idx])
+            instances = [instances[idx] for idx in order]
+            input_prompts = [input_prompts[idx] for idx in order]
+            prompts_token_ids = [input_ids[idx] for idx in order]
+
+        logger.warning(f"Submitting {len(instances)} prompts from {len(window)} files")
+        self.generate_batch(instances, use_tqdm=True, input_prompts=input_prompts)
+
+        if self.args.prefix_cache_ordering:
+            hit_rate = estimate_prefix_cache_hit_rate(prompts_token_ids)
+            logger.warning(f"Estimated prefix cache hit rate: {hit_rate:.2%}")
+
+
+@register_engine("hf")
+class HFEngine(Engine):
+    """
+    Inference with huggingface transformers, on batches of length-sorted
+    prompts sized by --batch_size or by the --max_batch_tokens budget
+    """
+
+    write_in_file_order = True
+
+    def load(self) -> None:
+        import torch
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+
+        model = self.args.model_name
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        logger.warning(f"Loading huggingface model: {model}")
+        self.tokenizer = AutoTokenizer.from_pretrained(model, trust_remote_code=True)
+        self.model = AutoModelForCausalLM.from_pretrained(
+            model,
+            trust_remote_code=True,
+            torch_dtype=torch.bfloat16,
+            force_download=True,
+        )
+        if self.tokenizer.pad_token_id is None:
+            self.tokenizer.pad_token_id = self.tokenizer.eos_token_id
+        # decoder-only models generate after the last prompt token
+        self.tokenizer.padding_side = "left"
+
+        self.model = self.model.to(self.device)
+        # input to token ids of its prompt, for the file being scheduled
+        self.input_ids_cache = {}
+
+    def tokenize(self, instances: list) -> list:
+        """Apply the chat template and tokenize, reusing the token ids of
+        inputs that were already tokenized
+
+        Args:
+            instances (list): instances
+
+        Returns:
+            list: token ids of every instance's prompt
+        """
+        user_messages = [instance["input"] for instance in instances]
+        missing_messages = [
+            message
+            for message in dict.fromkeys(user_messages)
+            if message not in self.input_ids_cache
+        ]
+        if missing_messages:
+            input_prompts = render_prompts(missing_messages, self.tokenizer)
+            self.input_ids_cache.update(
+                zip(missing_messages, self.tokenizer(input_prompts)["input_ids"])
+            )
+        return [self.input_ids_cache[message] for message in user_messages]
+
+    def schedule(self, instances: list) -> list:
+        self.input_ids_cache = {}
+        input_ids = self.tokenize(instances)
+        batches = create_length_bucketed_batches(
+            [len(each_input_ids) for each_input_ids in input_ids],
+            self.args.batch_size,
+            self.args.max_batch_tokens,
+            self.args.max_output_length,
+        )
+        return [[instances[index] for index in batch] for batch in batches]
+
+    def generate_batch(self, instances: list) -> list:
+        inputs = self.tokenizer.pad(
+            {"input_ids": self.tokenize(instances)}, return_tensors="pt"
+        )
+        for key in inputs:
+            inputs[key] = inputs[key].to(self.device)
+
+        outputs = self.model.generate(
+            input_ids=inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            do_sample=False,
+            num_return_sequences=1,
+            max_new_tokens=self.args.max_output_length,
+        )
+
+        # prompts are left padded, so generated tokens start at the same index
+        decoded_outputs = self.tokenizer.batch_decode(
+            outputs[:, inputs["input_ids"].shape[1] :],
+            skip_special_tokens=True,
+        )
+        for instance, output in zip(instances, decoded_outputs):
+            instance["output"] = output
+        return instances
+
+
+@register_engine("online")
+class OnlineEngine(Engine):
+    """
+    Inference through an OpenAI compatible server with at most
+    --max_concurrency requests in flight, results are written as they complete
+    """
+
+    def create_client(self) -> AsyncOpenAI:
+        return AsyncOpenAI(
+            base_url=self.args.base_url or None,
+            api_key=self.args.api_key or os.environ.get("OPENAI_API_KEY", "EMPTY"),
+            # retries are handled by generate_online
+            max_retries=0,
+        )
+
+    def run(self, pending_files, result_writer) -> None:
+        asyncio.run(self.run_async(pending_files, result_writer))
+
+    async def run_async(self, pending_files, result_writer) -> None:
+        client = self.create_client()
+        semaphore = asyncio.Semaphore(self.args.max_concurrency)
+        # instances are read from the pending files as the workers take them,
+        # so the instances and tasks alive are bounded by --max_concurrency
+        queue = asyncio.Queue(maxsize=self.args.max_concurrency)
+        progress = tqdm(desc="Requests")
+
+        # completed results are written in groups to bound the number of flushes
+        completed = {}
+        num_completed = 0
+        num_failed = 0
+
+        def write_completed():
+            nonlocal completed
+            for file_name, results in completed.items():
+                result_writer.write(file_name, results)
+            completed = {}
+
+        async def worker():
+            nonlocal num_completed, num_failed
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                file_name, instance = item
+                try:
+                    await generate_online(client, semaphore, instance, self.args)
+                except Exception:
+                    logger.exception("Request failed, it will be retried with --resume")
+                    num_failed += 1
+                else:
+                    completed.setdefault(file_name, []).append(instance)
+                    num_completed += 1
+                    if num_completed % self.args.max_concurrency == 0:
+                        write_completed()
+                progress.update(1)
+
+        async def produce():
+            for file_name, instances in pending_files:
+                for instance in instances:
+                    await queue.put((file_name, instance))
+            for _ in range(self.args.max_concurrency):
+                await queue.put(None)
+
+        # a failing worker or file cancels the others instead of blocking them
+        tasks = [asyncio.create_task(produce())] + [
+            asyncio.create_task(worker()) for _ in range(self.args.max_concurrency)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            write_completed()
+            progress.close()
+            await client.close()
+
+        if num_failed > 0:
+            logger.warning(
+                f"{num_failed} of {num_completed + num_failed} requests failed"
+            )
+
+
+@register_engine("oracle")
+class OracleEngine(Engine):
+    """
+    Fake engine answering with the expected output, instruction_output[-1],
+    or with a wrong answer for a --fake_error_rate share of the instances,
+    after sleeping --fake_latency seconds per batch. The answers only depend
+    on the instance, which makes runs reproducible and lets the harness
+    (I/O, templating, batching and scoring) be profiled without a GPU.
+
+    The chat template is applied only if --tokenizer_name is given.
+    """
+
+    def load(self) -> None:
+        self.tokenizer = None
+        if self.args.tokenizer_name != "auto":
+            from transformers import AutoTokenizer
+
+            self.tokenizer = AutoTokenizer.from_pretrained(
+                self.tokenizer_name, trust_remote_code=True
+            )
+
+    def fake_output(self, instance: dict, prompt: str) -> str:
+        """Expected output, or a wrong answer taken from the instance's error
+        sets, or else the reversed expected output
+
+        Args:
+            instance (dict): instance
+            prompt (str): prompt of the instance
+
+        Returns:
+            str: fake output
+        """
+        answer = str(instance["instruction_output"][-1])
+        rng = random.Random(
+            f"{instance['dataset']}${instance['instruction_id']}${instance['id']}"
+        )
+        if rng.random() >= self.args.fake_error_rate:
+            return answer
+        wrong_answers = [
+            str(candidate)
+            for candidate in instance.get("reasoning_error_set", [])
+            + instance.get("instruction_following_errors_set", [])
+            if str(candidate) != answer
+        ]
+        return rng.choice(wrong_answers) if wrong_answers else answer[::-1]
+
+    def generate_batch(self, instances: list) -> list:
+        if self.tokenizer is not None:
+            input_prompts = render_prompts(
+                [instance["input"] for instance in instances],
+                self.tokenizer,
+            )
+        else:
+            input_prompts = [instance["input"] for instance in instances]
+        if self.args.fake_latency > 0:
+            time.sleep(self.args.fake_latency)
+        for instance, input_prompt in zip(instances, input_prompts):
+            instance["prompt"] = input_prompt
+            instance["output"] = self.fake_output(instance, input_prompt)
+        return instances
+
+
+@register_engine("echo")
+class EchoEngine(OracleEngine):
+    """
+    Fake engine answering with the prompt itself
+    """
+
+    def fake_output(self, instance: dict, prompt: str) -> str:
+        return prompt
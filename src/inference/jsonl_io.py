@@ -0,0 +1,70 @@
+import json
+from typing import Iterable, Iterator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# raised on malformed lines by both backends, orjson's error is a subclass
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data):
+    """Parse a JSON document with orjson when it is installed
+
+    Args:
+        data (bytes | str): JSON document
+
+    Returns:
+        Any: parsed document
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(record) -> bytes:
+    """Serialize a record to a single line of JSON, without the line break
+
+    Args:
+        record (Any): record to serialize
+
+    Returns:
+        bytes: utf8 encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record).encode("utf8")
+
+
+def iter_jsonl(
+    file_path: str, fields: Iterable = None, errors: str = "strict"
+) -> Iterator[dict]:
+    """Lazily read the records of a jsonl file, one line at a time
+
+    Args:
+        file_path (str): path to the jsonl file
+        fields (Iterable, optional): keep only these keys of every record.
+            Every line is still parsed in full, the other values are released
+            right after, so this bounds the memory held by long outputs and
+            prompts but not the parsing time. Defaults to None, keeping every key.
+        errors (str, optional): utf8 decoding error handler, e.g. "ignore" to
+            drop invalid bytes. Defaults to "strict".
+
+    Yields:
+        dict: records, blank lines are skipped
+    """
+    if fields is not None:
+        fields = tuple(fields)
+    with open(file_path, "rb") as reader:
+        for each_line in reader:
+            if not each_line.strip():
+                continue
+            if errors != "strict":
+                each_line = each_line.decode("utf8", errors=errors)
+            record = loads(each_line)
+            if fields is not None:
+                record = {key: record[key] for key in fields if key in record}
+            yield record
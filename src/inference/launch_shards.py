@@ -0,0 +1,116 @@
+import os
+import sys
+import subprocess
+from argparse import ArgumentParser
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from inference.run_inference import (  # noqa: E402
+    get_args,
+    merge_shard_results,
+    write_results_store,
+)
+
+RUN_INFERENCE_SCRIPT = str(Path(__file__).resolve().parent / "run_inference.py")
+
+
+def get_visible_gpus() -> list:
+    """List the GPUs available to the launcher
+
+    Returns:
+        list: GPU ids, empty when running on CPU
+    """
+    if os.environ.get("CUDA_VISIBLE_DEVICES"):
+        return os.environ["CUDA_VISIBLE_DEVICES"].split(",")
+    try:
+        import torch
+
+        return [str(index) for index in range(torch.cuda.device_count())]
+    except ImportError:
+        return []
+
+
+def main() -> None:
+    """Launch one run_inference process per shard on this node, each on its
+    own group of GPUs, and merge the shard results once every shard is done.
+
+    Any argument not listed below is forwarded to run_inference.py, e.g.
+
+    python inference/launch_shards.py --num_shards 8 --engine vllm
+    --model_name <model> --input_path <path to KCIF> --output_folder <path>
+    """
+    parser = ArgumentParser(description="Data-parallel inference on KCIF")
+    parser.add_argument("--num_shards", type=int, required=True)
+    parser.add_argument(
+        "--shard_ids",
+        type=str,
+        default=None,
+        help="comma separated shards to launch on this node, defaults to all. "
+        "With several nodes, run --merge_only once every node is done",
+    )
+    parser.add_argument(
+        "--gpus_per_shard",
+        type=int,
+        default=None,
+        help="defaults to --tensor_parallel_size",
+    )
+    parser.add_argument(
+        "--merge_only",
+        action="store_true",
+        help="only merge the results of already finished shards",
+    )
+    launcher_args, run_inference_argv = parser.parse_known_args()
+    run_inference_args = get_args(run_inference_argv)
+
+    num_shards = launcher_args.num_shards
+    if not launcher_args.merge_only:
+        if launcher_args.shard_ids is None:
+            shard_ids = list(range(num_shards))
+        else:
+            shard_ids = [
+                int(shard_id) for shard_id in launcher_args.shard_ids.split(",")
+            ]
+
+        gpus = get_visible_gpus()
+        gpus_per_shard = (
+            launcher_args.gpus_per_shard or run_inference_args.tensor_parallel_size
+        )
+        if gpus:
+            assert len(shard_ids) * gpus_per_shard <= len(gpus), (
+                f"{len(shard_ids)} shards need {len(shard_ids) * gpus_per_shard} "
+                f"GPUs, only {len(gpus)} are visible"
+            )
+
+        processes = []
+        for index, shard_id in enumerate(shard_ids):
+            env = dict(os.environ)
+            if gpus:
+                shard_gpus = gpus[index * gpus_per_shard : (index + 1) * gpus_per_shard]
+                env["CUDA_VISIBLE_DEVICES"] = ",".join(shard_gpus)
+            command = [sys.executable, RUN_INFERENCE_SCRIPT] + run_inference_argv
+            command += ["--num_shards", str(num_shards), "--shard_id", str(shard_id)]
+            print(f"Launching shard {shard_id}: {' '.join(command)}")
+            processes.append((shard_id, subprocess.Popen(command, env=env)))
+
+        failed_shards = [
+            shard_id for shard_id, process in processes if process.wait() != 0
+        ]
+        if failed_shards:
+            sys.exit(f"Shards {failed_shards} failed, re-run them with --resume")
+        if len(shard_ids) < num_shards:
+            print("Run with --merge_only once the other shards are done")
+            return
+
+    num_results = merge_shard_results(run_inference_args.output_folder, num_shards)
+    print(
+        f"Merged {num_results} results into "
+        f"{os.path.join(run_inference_args.output_folder, 'all_results.jsonl')}"
+    )
+    write_results_store(
+        run_inference_args.output_folder, run_inference_args.output_format
+    )
+
+
+if __name__ == "__main__":
+    main()
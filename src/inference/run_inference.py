@@ -1,34 +1,40 @@
-import json
 import os
-import torch
+import sys
 import logging
 from glob import glob
-from argparse import ArgumentParser, Namespace
+from argparse import ArgumentParser, BooleanOptionalAction, Namespace
+from pathlib import Path
 
 from tqdm import tqdm
 
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from openai import OpenAI
-
-try:
-    from vllm import LLM, SamplingParams
-except ImportError:
-    print("Unable tp Import VLLM")
+sys.path.append(str(Path(__file__).resolve().parent.parent))
 
+from inference.engines import ENGINE_REGISTRY, get_engine  # noqa: E402
+from inference import columnar_io, jsonl_io  # noqa: E402
 
 logger = logging.getLogger(name="KCIF")
 
 
-def get_args() -> Namespace:
+def get_args(argv: list = None) -> Namespace:
     """Define Arguments used in command-line
 
+    Args:
+        argv (list, optional): arguments to parse. Defaults to sys.argv.
+
     Returns:
         Namespace: _description_
     """
     parser = ArgumentParser()
 
     group = parser.add_argument_group("Evaluate LLM on KCIF")
-    group.add_argument("--engine", default="vllm", type=str)
+    group.add_argument(
+        "--engine",
+        default="vllm",
+        type=str,
+        choices=sorted(ENGINE_REGISTRY),
+        help="inference backend, oracle and echo are fake engines that need "
+        "no model, to test and profile the harness",
+    )
     group.add_argument("--base_url", default="", type=str)
     group.add_argument(
         "--model_name",
@@ -47,6 +53,66 @@ def get_args() -> Namespace:
         "--batch_size", type=int, default=1, help="batch size for inference"
     )
 
+    group.add_argument(
+        "--prefix_cache_ordering",
+        action=BooleanOptionalAction,
+        default=False,
+        help="vllm only: enable automatic prefix caching and submit the prompts "
+        "of each window of files ordered so that prompts sharing a prefix run "
+        "together. Implies --continuous_batching",
+    )
+
+    group.add_argument(
+        "--max_batch_tokens",
+        type=int,
+        default=None,
+        help="hf only: size batches of length-sorted prompts by this budget of "
+        "prompt and generated tokens instead of --batch_size",
+    )
+
+    group.add_argument(
+        "--continuous_batching",
+        action=BooleanOptionalAction,
+        default=False,
+        help="vllm only: submit the prompts of --continuous_batching_files input "
+        "files in a single generate call and let vllm's scheduler pick the "
+        "batch size",
+    )
+    group.add_argument(
+        "--continuous_batching_files",
+        type=int,
+        default=16,
+        help="vllm only: input files per generate call with --continuous_batching "
+        "or --prefix_cache_ordering, 0 for every file of the run. Their results "
+        "are held in memory and written once the call completes, so a crash "
+        "loses the window in progress",
+    )
+
+    group.add_argument(
+        "--max_concurrency",
+        type=int,
+        default=64,
+        help="online only: maximum number of in-flight requests",
+    )
+    group.add_argument(
+        "--max_retries",
+        type=int,
+        default=5,
+        help="online only: retries on rate limits, server errors and timeouts",
+    )
+    group.add_argument(
+        "--request_timeout",
+        type=float,
+        default=120.0,
+        help="online only: timeout in seconds of a single request",
+    )
+    group.add_argument(
+        "--api_key",
+        type=str,
+        default=None,
+        help="online only: defaults to the OPENAI_API_KEY environment variable",
+    )
+
     group.add_argument(
         "--max_input_length", type=int, default=8192, help="max input length"
     )
@@ -54,220 +120,367 @@ def get_args() -> Namespace:
         "--max_output_length", type=int, default=256, help="max output length"
     )
 
+    group.add_argument(
+        "--fake_latency",
+        type=float,
+        default=0.0,
+        help="oracle and echo only: seconds to sleep per batch",
+    )
+    group.add_argument(
+        "--fake_error_rate",
+        type=float,
+        default=0.0,
+        help="oracle only: share of the instances answered with a wrong answer",
+    )
+
     group.add_argument("--output_folder", type=str, help="output folder")
+    group.add_argument(
+        "--output_format",
+        type=str,
+        default="jsonl",
+        choices=["jsonl"] + list(columnar_io.COLUMNAR_FORMATS),
+        help="convert all_results.jsonl to a columnar store partitioned by "
+        "dataset and instruction once the run is complete, which replaces it",
+    )
+    group.add_argument(
+        "--num_shards",
+        type=int,
+        default=1,
+        help="number of data-parallel shards, see launch_shards.py",
+    )
+    group.add_argument("--shard_id", type=int, default=0, help="shard to run")
+    group.add_argument(
+        "--shard_by",
+        type=str,
+        default="instance",
+        choices=["instance", "file"],
+        help="split the instances of every file or assign whole files to shards",
+    )
+    group.add_argument(
+        "--resume",
+        action=BooleanOptionalAction,
+        default=False,
+        help="skip the instances recorded in the output folder's manifest "
+        "instead of starting over",
+    )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     return args
 
 
-def apply_chat_template(user_message, tokenizer):
-    """Applies chat template dfined by the tokenizer
+def load_data_instances(file_path: str, num_shards: int = 1, shard_id: int = 0) -> list:
+    """Load every instance of a dataset/instruction file
 
     Args:
-        user_message (_type_): user message
-        tokenizer (_type_): tokenizer
+        file_path (str): path to the jsonl file
+        num_shards (int, optional): number of instance shards. Defaults to 1.
+        shard_id (int, optional): keep only the instances of this shard,
+            i.e. whose line index modulo num_shards is shard_id. Defaults to 0.
 
     Returns:
-        list: user message after applying chat template
+        list: instances, each with an "id" set to its line index in the file
     """
-    chat = []
+    data_instances = []
+    with open(file_path, "rb") as reader:
+        for line_index, each_line in enumerate(reader):
+            # lines of other shards are skipped without being parsed
+            if line_index % num_shards != shard_id:
+                continue
+            instance = jsonl_io.loads(each_line.decode("utf8", errors="ignore"))
+            instance["id"] = line_index
+            data_instances.append(instance)
+    return data_instances
 
-    conversation = {}
-    conversation["role"] = "user"
-    conversation["content"] = user_message
 
-    chat.append(conversation)
+def get_shard_output_folder(output_folder: str, num_shards: int, shard_id: int) -> str:
+    """Output folder of a shard, inside the output folder of the whole run
 
-    if tokenizer.chat_template:
-        prompt = tokenizer.apply_chat_template(
-            chat,
-            add_generation_prompt=True,
-            tokenize=False,
-        )
-    else:
-        prompt = user_message
+    Args:
+        output_folder (str): output folder of the whole run
+        num_shards (int): number of shards
+        shard_id (int): shard id
 
-    return prompt
+    Returns:
+        str: output folder of the shard
+    """
+    return os.path.join(output_folder, f"shard_{shard_id}_of_{num_shards}")
 
 
-def main() -> None:
-    args = get_args()
+def select_shard(all_datasets: list, args) -> tuple:
+    """Deterministically split the work between shards, either by assigning
+    whole files round-robin or by splitting the instances of every file
 
-    model = args.model_name
+    Args:
+        all_datasets (list): sorted paths to the dataset/instruction files
+        args (Namespace): command-line arguments
 
-    if not os.path.exists(args.output_folder):
-        os.makedirs(args.output_folder)
-    output_folder = args.output_folder
-    print("loading model!")
+    Returns:
+        tuple: files of the shard, and the (num_shards, shard_id) instance
+            split to apply when loading each file
+    """
+    assert 0 <= args.shard_id < args.num_shards, "shard_id must be below num_shards"
+    if args.num_shards == 1:
+        return all_datasets, (1, 0)
+    if args.shard_by == "file":
+        return all_datasets[args.shard_id :: args.num_shards], (1, 0)
+    return all_datasets, (args.num_shards, args.shard_id)
 
-    if args.tokenizer_name == "auto":
-        args.tokenizer_name = args.model_name
 
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+def merge_shard_results(output_folder: str, num_shards: int) -> int:
+    """Merge the results of every shard into a single all_results.jsonl,
+    ordered by file and instance id like an unsharded run. The file of each
+    result is read back from the shard's manifest
+
+    Args:
+        output_folder (str): output folder of the whole run
+        num_shards (int): number of shards
 
-    if args.engine == "vllm":
-        sampling_params = SamplingParams(
-            temperature=0.0, max_tokens=args.max_output_length, n=1
+    Returns:
+        int: number of merged results
+    """
+    keyed_results = []
+    for shard_id in range(num_shards):
+        shard_output_folder = get_shard_output_folder(
+            output_folder, num_shards, shard_id
         )
-        llm = LLM(
-            model=model,
-            tokenizer=args.tokenizer_name,
-            tensor_parallel_size=args.tensor_parallel_size,
-            dtype=torch.bfloat16,
-            gpu_memory_utilization=0.9,
-            trust_remote_code=True,
+        results_path = os.path.join(shard_output_folder, ResultWriter.RESULTS_FILE_NAME)
+        manifest_path = os.path.join(
+            shard_output_folder, ResultWriter.MANIFEST_FILE_NAME
         )
-    elif args.engine == "hf":
-        logger.warning(f"Loading huggingface model: {model}")
-        tokenizer = AutoTokenizer.from_pretrained(model, trust_remote_code=True)
-        model = AutoModelForCausalLM.from_pretrained(
-            model,
-            trust_remote_code=True,
-            torch_dtype=torch.bfloat16,
-            force_download=True,
+        with open(manifest_path, "rb") as manifest_reader, open(
+            results_path, "rb"
+        ) as results_reader:
+            for each_line in manifest_reader:
+                try:
+                    entry = jsonl_io.loads(each_line)
+                except jsonl_io.JSONDecodeError:
+                    break
+                # a manifest entry lists its results in the order they were written,
+                # only their offsets are kept so memory does not grow with the outputs
+                for file_name, instance_id in entry["completed"]:
+                    offset = results_reader.tell()
+                    results_reader.readline()
+                    keyed_results.append(((file_name, instance_id), shard_id, offset))
+
+    keyed_results.sort(key=lambda keyed_result: keyed_result[0])
+    results_readers = [
+        open(
+            os.path.join(
+                get_shard_output_folder(output_folder, num_shards, shard_id),
+                ResultWriter.RESULTS_FILE_NAME,
+            ),
+            "rb",
         )
-        if tokenizer.pad_token_id is None:
-            tokenizer.pad_token_id = tokenizer.eos_token_id
-
-        model = model.to(device)
-    elif args.engine == "online":
-        client = OpenAI(
-            # Or use the `OPENAI_BASE_URL` env var
-            base_url=args.base_url,
+        for shard_id in range(num_shards)
+    ]
+    with open(
+        os.path.join(output_folder, ResultWriter.RESULTS_FILE_NAME), "wb"
+    ) as writer:
+        for _, shard_id, offset in keyed_results:
+            results_readers[shard_id].seek(offset)
+            writer.write(results_readers[shard_id].readline())
+    for results_reader in results_readers:
+        results_reader.close()
+    return len(keyed_results)
+
+
+def write_results_store(output_folder: str, output_format: str) -> None:
+    """Convert the all_results.jsonl of a complete run to the columnar store of
+    output_format, which replaces it. --resume writes it back from the store
+
+    Args:
+        output_folder (str): output folder of the run
+        output_format (str): "jsonl" or one of columnar_io.COLUMNAR_FORMATS
+    """
+    if output_format == "jsonl":
+        return
+    results_path = os.path.join(output_folder, ResultWriter.RESULTS_FILE_NAME)
+    store_path = columnar_io.get_columnar_results_path(output_folder, output_format)
+    num_results = columnar_io.write_columnar_results(
+        results_path, store_path, output_format
+    )
+    # the store is complete, keeping the jsonl would store every result twice
+    os.remove(results_path)
+    logger.warning(f"Wrote {num_results} results to {store_path}")
+
+
+def restore_results_jsonl(output_folder: str) -> bool:
+    """Write all_results.jsonl back from the columnar store of a complete run,
+    when it was replaced by write_results_store
+
+    Args:
+        output_folder (str): output folder of the run
+
+    Returns:
+        bool: True if all_results.jsonl was restored
+    """
+    results_path = os.path.join(output_folder, ResultWriter.RESULTS_FILE_NAME)
+    if os.path.exists(results_path):
+        return False
+    for output_format in columnar_io.COLUMNAR_FORMATS:
+        store_path = columnar_io.get_columnar_results_path(
+            output_folder, output_format
         )
+        if os.path.exists(store_path):
+            num_results = columnar_io.write_jsonl_results(store_path, results_path)
+            logger.warning(f"Restored {num_results} results from {store_path}")
+            return True
+    return False
+
 
-    all_datasets = glob(os.path.join(args.input_path, "*jsonl"))
-    all_results = []
-    id_to_instance_mapping = {}
+class ResultWriter:
+    """
+    Streams results to all_results.jsonl in append-only mode and records every
+    flushed batch in manifest.jsonl as the completed (file, instance id) pairs
+    along with the size of all_results.jsonl after the batch was written
+    """
 
-    # for each dataset and instruction combination
+    RESULTS_FILE_NAME = "all_results.jsonl"
+    MANIFEST_FILE_NAME = "manifest.jsonl"
+
+    def __init__(self, output_folder: str, resume: bool = False):
+        """
+        Initialize the ResultWriter instance
+
+        Args:
+            output_folder (str): output folder
+            resume (bool, optional): Keep the results recorded in the manifest.
+                Defaults to False.
+        """
+        self.results_path = os.path.join(output_folder, self.RESULTS_FILE_NAME)
+        self.manifest_path = os.path.join(output_folder, self.MANIFEST_FILE_NAME)
+        self.completed = set()
+
+        results_offset = 0
+        manifest_offset = 0
+        restored = resume and restore_results_jsonl(output_folder)
+        if resume and os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "rb") as reader:
+                for each_line in reader:
+                    try:
+                        entry = jsonl_io.loads(each_line)
+                    except jsonl_io.JSONDecodeError:
+                        # a torn entry from a crash while writing the manifest
+                        break
+                    self.completed.update(
+                        (file_name, instance_id)
+                        for file_name, instance_id in entry["completed"]
+                    )
+                    results_offset = entry["offset"]
+                    manifest_offset += len(each_line)
+            if restored:
+                # the store holds every result of the manifest, in its order
+                results_offset = os.path.getsize(self.results_path)
+            logger.warning(
+                f"Resuming with {len(self.completed)} completed instances "
+                f"from {self.manifest_path}"
+            )
+
+        # anything past the last manifest entry was not fully written, drop it
+        self.results_writer = open(self.results_path, "ab")
+        self.results_writer.truncate(results_offset)
+        self.manifest_writer = open(self.manifest_path, "ab")
+        self.manifest_writer.truncate(manifest_offset)
+
+    def is_completed(self, file_name: str, instance: dict) -> bool:
+        """Check whether an instance of a file was already written
+
+        Args:
+            file_name (str): name of the dataset/instruction file
+            instance (dict): instance with its "id"
+
+        Returns:
+            bool: True if the instance is recorded in the manifest
+        """
+        return (file_name, instance["id"]) in self.completed
+
+    def write(self, file_name: str, results: list) -> None:
+        """Append the results of a batch and record them in the manifest
+
+        Args:
+            file_name (str): name of the dataset/instruction file
+            results (list): instances with the generated output
+        """
+        if len(results) == 0:
+            return
+        for each_result in results:
+            self.results_writer.write(jsonl_io.dumps(each_result) + b"\n")
+        self.results_writer.flush()
+        os.fsync(self.results_writer.fileno())
+
+        completed = [[file_name, each_result["id"]] for each_result in results]
+        entry = {"completed": completed, "offset": self.results_writer.tell()}
+        self.manifest_writer.write(jsonl_io.dumps(entry) + b"\n")
+        self.manifest_writer.flush()
+        self.completed.update((file_name, instance_id) for _, instance_id in completed)
+
+    def close(self) -> None:
+        self.results_writer.close()
+        self.manifest_writer.close()
+
+
+def iter_pending_files(all_datasets: list, result_writer, instance_shard: tuple):
+    """Load the instances of every file, skipping those completed by a
+    previous run
+
+    Args:
+        all_datasets (list): paths to the dataset/instruction files
+        result_writer (ResultWriter): writer holding the completed instances
+        instance_shard (tuple): (num_shards, shard_id) split of the instances
+            of each file
+
+    Yields:
+        tuple: file name and its pending instances, files without pending
+            instances are skipped
+    """
     for each_dataset_instruction in tqdm(all_datasets):
         logger.warning(f"Loading evaluation on {each_dataset_instruction}...")
 
-        data_instances = []
-        with open(
-            each_dataset_instruction, "r", errors="ignore", encoding="utf8"
-        ) as reader:
-            for each_line in reader:
-                instance = json.loads(each_line)
-                instance["id"] = len(data_instances)
-                data_instances.append(instance)
-            reader.close()
+        file_name = os.path.basename(each_dataset_instruction)
+        data_instances = load_data_instances(each_dataset_instruction, *instance_shard)
 
         logger.info(
-            f"Number of instances in dataset {each_dataset_instruction} is {len(data_instances)}"
+            f"Number of instances in dataset {each_dataset_instruction} "
+            f"is {len(data_instances)}"
         )
 
-        if args.engine == "vllm":
-            tokenizer = AutoTokenizer.from_pretrained(model, trust_remote_code=True)
-
-            batch_examples = []
-            for data_index in tqdm(
-                range(len(data_instances)),
-                desc=f"For each instance in dataset {each_dataset_instruction}",
-            ):
-                batch_examples.append(data_instances[data_index])
-
-                if len(batch_examples) > args.batch_size:
-                    input_prompts = []
-                    # apply chat template for each example
-                    for each_example in batch_examples:
-                        input_prompts.append(
-                            apply_chat_template(each_example["input"], tokenizer)
-                        )
-
-                    outputs = llm.generate(
-                        input_prompts, sampling_params=sampling_params, use_tqdm=False
-                    )
+        # skip the instances completed by a previous run
+        data_instances = [
+            instance
+            for instance in data_instances
+            if not result_writer.is_completed(file_name, instance)
+        ]
+        if len(data_instances) > 0:
+            yield file_name, data_instances
 
-                    for each_index in range(len(batch_examples)):
-                        batch_examples[each_index]["output"] = (
-                            outputs[each_index].outputs[0].text
-                        )
-                        batch_examples[each_index]["prompt"] = input_prompts[each_index]
-                        all_results.append(batch_examples[each_index])
-
-                    batch_examples = []
-        # Huggingface inference
-        elif args.engine == "hf":
-            batch_examples = []
-            for data_index in tqdm(
-                range(len(data_instances)),
-                desc=f"For each instance in dataset {each_dataset_instruction}",
-            ):
-                batch_examples.append(data_instances[data_index])
-
-                if len(batch_examples) > args.batch_size:
-                    input_prompts = []
-                    # apply chat template for each example
-                    for each_example in batch_examples:
-                        input_prompts.append(
-                            apply_chat_template(each_example["input"], tokenizer)
-                        )
-
-                    inputs = tokenizer(input_prompts, return_tensors="pt", padding=True)
-                    for key in inputs:
-                        inputs[key] = inputs[key].to(device)
-
-                    outputs = model.generate(
-                        input_ids=inputs["input_ids"],
-                        attention_mask=inputs["attention_mask"],
-                        do_sample=False,
-                        num_return_sequences=1,
-                        max_new_tokens=args.max_output_length,
-                    )
 
-                    decoded_outputs = [
-                        tokenizer.decode(y, skip_special_tokens=False) for y in outputs
-                    ]
-
-                    for index in range(len(batch_examples)):
-                        batch_examples[index]["output"] = decoded_outputs[index].split(
-                            input_prompts[index]
-                        )[-1]
-                        temp = tokenizer.encode(
-                            batch_examples[index]["output"], add_special_tokens=False
-                        )
-                        batch_examples[index]["output"] = tokenizer.decode(
-                            temp, skip_special_tokens=True
-                        )
-                        all_results.append(batch_examples[index])
-
-                    batch_examples = []
-        elif args.engine == "online":
-            for data_index in tqdm(
-                range(len(data_instances)),
-                desc=f"For each instance in dataset {each_dataset_instruction}",
-            ):
-                instance_id = (
-                    str(data_instances[data_index]["id"])
-                    + "$"
-                    + data_instances[data_index]["dataset"]
-                    + "$"
-                    + data_instances[data_index]["instruction_id"]
-                )
-                if instance_id in id_to_instance_mapping:
-                    all_results.append(data_instances[data_index])
-                    continue
-
-                # apply chat template for each example
-                input_prompt = apply_chat_template(each_example["input"])
-                chat_completion = client.chat.completions.create(
-                    messages=input_prompt,
-                    model=args.model_name,
-                )
-
-                data_instances[data_index]["output"] = input_prompt
-                data_instances[data_index]["prompt"] = chat_completion.choices[
-                    0
-                ].text.strip()
-                all_results.append(data_instances[data_index]["prompt"])
-
-        with open(os.path.join(output_folder, f"all_results.jsonl"), "w") as writer:
-            for each_result in all_results:
-                writer.write(json.dumps(each_result))
-                writer.write("\n")
-            writer.close()
+def main() -> None:
+    args = get_args()
+
+    output_folder = args.output_folder
+    if args.num_shards > 1:
+        output_folder = get_shard_output_folder(
+            output_folder, args.num_shards, args.shard_id
+        )
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    print("loading model!")
+    engine = get_engine(args.engine, args)
+    engine.load()
+
+    all_datasets = sorted(glob(os.path.join(args.input_path, "*jsonl")))
+    all_datasets, instance_shard = select_shard(all_datasets, args)
+
+    result_writer = ResultWriter(output_folder, resume=args.resume)
+    engine.run(
+        iter_pending_files(all_datasets, result_writer, instance_shard), result_writer
+    )
+    engine.close()
+    result_writer.close()
+    # the results of a shard are converted once they are merged, by launch_shards.py
+    if args.num_shards == 1:
+        write_results_store(output_folder, args.output_format)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# the packages are imported the way the scripts import them
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "src"))
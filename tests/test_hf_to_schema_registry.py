@@ -0,0 +1,22 @@
+import pytest
+
+from construct_data.hf_to_schema import LOADER_REGISTRY, get_loader
+
+
+@pytest.mark.parametrize(
+    "name, get_categories",
+    [
+        ("BBH", lambda loader_class: list(loader_class.BBH_TASKS)),
+        ("MMLUPro", lambda loader_class: loader_class.CATEGORIES),
+    ],
+)
+def test_registry_categories_match_loader(name, get_categories):
+    # the loader modules import datasets, the registry does not
+    pytest.importorskip("datasets")
+    assert LOADER_REGISTRY[name]["categories"] == get_categories(get_loader(name))
+
+
+def test_registry_lists_categories_of_dictionary_loaders_only():
+    assert {
+        name for name, info in LOADER_REGISTRY.items() if info["categories"]
+    } == {"BBH", "MMLUPro"}
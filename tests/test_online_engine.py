@@ -0,0 +1,135 @@
+import asyncio
+from argparse import Namespace
+from collections import Counter
+from types import SimpleNamespace
+
+import httpx
+from openai import APIConnectionError, BadRequestError
+
+from inference import engines
+from inference.engines import OnlineEngine
+
+
+class FakeCompletions:
+    """
+    chat.completions of a fake OpenAI compatible server, failing the first
+    num_failures requests of every prompt with the given error
+    """
+
+    def __init__(self, num_failures: int = 0, error_class=APIConnectionError):
+        self.num_failures = num_failures
+        self.error_class = error_class
+        self.calls = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.max_tasks = 0
+
+    async def create(self, messages, **kwargs):
+        prompt = messages[0]["content"]
+        self.calls[prompt] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.max_tasks = max(self.max_tasks, len(asyncio.all_tasks()))
+        try:
+            await asyncio.sleep(0.001)
+            if self.calls[prompt] <= self.num_failures:
+                request = httpx.Request("POST", "http://fake/v1/chat/completions")
+                if self.error_class is APIConnectionError:
+                    raise APIConnectionError(request=request)
+                raise self.error_class(
+                    "bad request",
+                    response=httpx.Response(400, request=request),
+                    body=None,
+                )
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=prompt[::-1]))]
+            )
+        finally:
+            self.in_flight -= 1
+
+
+class FakeClient:
+    def __init__(self, completions: FakeCompletions):
+        self.chat = SimpleNamespace(completions=completions)
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeResultWriter:
+    def __init__(self):
+        self.results = []
+
+    def write(self, file_name: str, results: list):
+        self.results.extend((file_name, result["id"]) for result in results)
+
+
+def run_engine(monkeypatch, completions, max_concurrency=4, max_retries=3):
+    # no backoff delay
+    monkeypatch.setattr(engines.random, "uniform", lambda low, high: 0.0)
+    args = Namespace(
+        model_name="fake",
+        tokenizer_name="auto",
+        max_concurrency=max_concurrency,
+        max_retries=max_retries,
+        max_output_length=16,
+        request_timeout=1.0,
+        base_url="",
+        api_key="EMPTY",
+    )
+    engine = OnlineEngine(args)
+    client = FakeClient(completions)
+    monkeypatch.setattr(engine, "create_client", lambda: client)
+    pending_files = [
+        (
+            f"file_{file_id}.jsonl",
+            [{"id": idx, "input": f"prompt {file_id} {idx}"} for idx in range(50)],
+        )
+        for file_id in range(3)
+    ]
+    result_writer = FakeResultWriter()
+    engine.run(iter(pending_files), result_writer)
+    assert client.closed
+    return pending_files, result_writer
+
+
+def test_concurrency_is_bounded(monkeypatch):
+    completions = FakeCompletions()
+    pending_files, result_writer = run_engine(monkeypatch, completions)
+
+    assert completions.max_in_flight == 4
+    # the main task, the producer and the workers, not a task per instance
+    assert completions.max_tasks <= 4 + 2
+    assert sorted(result_writer.results) == sorted(
+        (file_name, instance["id"])
+        for file_name, instances in pending_files
+        for instance in instances
+    )
+    for _, instances in pending_files:
+        for instance in instances:
+            assert instance["output"] == instance["input"][::-1]
+
+
+def test_retryable_errors_are_retried(monkeypatch):
+    completions = FakeCompletions(num_failures=2)
+    pending_files, result_writer = run_engine(monkeypatch, completions)
+
+    assert set(completions.calls.values()) == {3}
+    assert len(result_writer.results) == 150
+
+
+def test_requests_fail_after_max_retries(monkeypatch):
+    completions = FakeCompletions(num_failures=2)
+    _, result_writer = run_engine(monkeypatch, completions, max_retries=1)
+
+    assert set(completions.calls.values()) == {2}
+    assert result_writer.results == []
+
+
+def test_other_errors_are_not_retried(monkeypatch):
+    completions = FakeCompletions(num_failures=1, error_class=BadRequestError)
+    _, result_writer = run_engine(monkeypatch, completions)
+
+    assert set(completions.calls.values()) == {1}
+    assert result_writer.results == []